@@ -51,7 +51,8 @@ def connect_with_retry(max_attempts: int = 10):
 
 def run():
     conn = connect_with_retry()
-    cur = conn.cursor()
+    # unbuffered: rows are streamed from the server straight into the CSV
+    cur = conn.cursor(buffered=False)
 
     # Export only ISO referentials (2 & 3)
     cur.execute("""
@@ -73,8 +74,7 @@ def run():
     with open(out_path, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(["referentialId","questionKey","processId","article","title","questionText"])
-        for row in cur.fetchall():
-            w.writerow(row)
+        w.writerows(cur)
 
     cur.close()
     conn.close()
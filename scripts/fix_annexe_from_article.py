@@ -1,5 +1,4 @@
 import os
-import re
 from urllib.parse import urlparse, unquote
 import mysql.connector
 
@@ -21,18 +20,21 @@ def parse_database_url(db_url: str):
 
     return host, port, user, password, database
 
-def extract_annexe(article: str) -> str | None:
-    """
-    Examples:
-      'MDR 2017/745 – Article 113' -> 'Article 113'
-      'MDR 2017/745 - Article 1'   -> 'Article 1'
-    """
-    if not article:
-        return None
-    m = re.search(r"\bArticle\s+(\d+)\b", article, flags=re.IGNORECASE)
-    if not m:
-        return None
-    return f"Article {m.group(1)}"
+# Rows where annexe is null/empty but article contains "Article <num>".
+# The extraction runs server-side (MySQL 8 REGEXP_*), e.g.:
+#   'MDR 2017/745 – Article 113' -> 'Article 113'
+#   'MDR 2017/745 - Article 1'   -> 'Article 1'
+UPDATE_SQL = r"""
+    UPDATE questions
+    SET annexe = CONCAT(
+        'Article ',
+        REGEXP_SUBSTR(REGEXP_SUBSTR(article, '\\bArticle\\s+\\d+\\b', 1, 1, 'i'), '\\d+')
+    )
+    WHERE (annexe IS NULL OR annexe = '')
+      AND article IS NOT NULL
+      AND article LIKE '%Article%'
+      AND REGEXP_LIKE(article, '\\bArticle\\s+\\d+\\b', 'i')
+"""
 
 def main():
     db_url = os.environ.get("DATABASE_URL")
@@ -47,43 +49,13 @@ def main():
         database=database,
         autocommit=False,
     )
-    cur = conn.cursor(dictionary=True)
-
-    # Rows where annexe is null/empty but article contains "Article <num>"
-    cur.execute("""
-        SELECT id, article, annexe
-        FROM questions
-        WHERE (annexe IS NULL OR annexe = '')
-          AND article IS NOT NULL
-          AND article LIKE '%Article%'
-        ORDER BY id ASC
-    """)
-    rows = cur.fetchall()
-    print(f"📦 Lignes à corriger détectées: {len(rows)}")
-
-    updated = 0
-    skipped = 0
-
-    for r in rows:
-        qid = r["id"]
-        art = r["article"] or ""
-        ann = extract_annexe(art)
-
-        if not ann:
-            skipped += 1
-            continue
-
-        cur.execute(
-            "UPDATE questions SET annexe=%s WHERE id=%s",
-            (ann, qid),
-        )
-        updated += 1
+    cur = conn.cursor()
 
-        if updated % 500 == 0:
-            print(f"✅ {updated} lignes mises à jour...")
+    cur.execute(UPDATE_SQL)
+    updated = cur.rowcount
 
     conn.commit()
-    print(f"✅ Terminé. updated={updated} skipped={skipped}")
+    print(f"✅ Terminé. updated={updated}")
 
     cur.close()
     conn.close()
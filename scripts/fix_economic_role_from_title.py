@@ -1,5 +1,4 @@
 import os
-import re
 from urllib.parse import urlparse, unquote
 import mysql.connector
 
@@ -12,27 +11,37 @@ ROLE_MAP = {
     "distributeur": "distributor",
 }
 
+ACCENTS = str.maketrans({"é": "e", "è": "e", "ê": "e", "à": "a", "ç": "c"})
+
 def norm(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = (
-        s.replace("é", "e")
-         .replace("è", "e")
-         .replace("ê", "e")
-         .replace("à", "a")
-         .replace("ç", "c")
-    )
-    return s
-
-def extract_role_and_clean_title(title: str):
-    if not title:
-        return None, None
-    m = re.match(r"^\s*\[(.*?)\]\s*(.*)$", title.strip())
-    if not m:
-        return None, None
-    role_label = norm(m.group(1))
-    clean_title = (m.group(2) or "").strip()
-    role = ROLE_MAP.get(role_label)
-    return role, clean_title
+    return (s or "").strip().lower().translate(ACCENTS)
+
+# Bracket label of "[Label] Title", normalized like norm() (trim/lower/accents).
+LABEL_SQL = (
+    "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE("
+    "LOWER(TRIM(SUBSTRING_INDEX(SUBSTRING(q.title, 2), ']', 1))), "
+    "'é', 'e'), 'è', 'e'), 'ê', 'e'), 'à', 'a'), 'ç', 'c')"
+)
+
+def build_update_sql():
+    """
+    Single UPDATE joining questions against the (label, role) pairs of ROLE_MAP:
+      '[Fabricant] Objet' -> economicRole='manufacturer', title='Objet'
+    """
+    role_rows = {norm(label): role for label, role in ROLE_MAP.items()}
+    values_sql = ", ".join(["ROW(%s, %s)"] * len(role_rows))
+    params = [x for pair in role_rows.items() for x in pair]
+    sql = f"""
+        UPDATE questions q
+        JOIN (VALUES {values_sql}) AS m(lbl, role)
+          ON {LABEL_SQL} = m.lbl
+        SET q.economicRole = m.role,
+            q.title = COALESCE(NULLIF(TRIM(SUBSTRING(q.title, LOCATE(']', q.title) + 1)), ''), q.title)
+        WHERE q.economicRole = 'all'
+          AND q.title IS NOT NULL
+          AND q.title LIKE '[%]%'
+    """
+    return sql, tuple(params)
 
 def parse_database_url(db_url: str):
     if not db_url:
@@ -54,9 +63,25 @@ def parse_database_url(db_url: str):
 
     return host, port, user, password, database
 
-def main():
+def get_db_config():
+    """DATABASE_URL first, else the split DB_* vars exported by parse_database_url.py."""
     db_url = os.environ.get("DATABASE_URL")
-    host, port, user, password, database = parse_database_url(db_url)
+    if db_url or not os.environ.get("DB_HOST"):
+        return parse_database_url(db_url)
+
+    host = os.environ["DB_HOST"]
+    port = int(os.environ.get("DB_PORT") or 3306)
+    user = os.environ.get("DB_USER")
+    password = os.environ.get("DB_PASSWORD", "")
+    database = os.environ.get("DB_NAME")
+
+    if not user or not database:
+        raise SystemExit("❌ DB_* env incomplete (DB_USER/DB_NAME missing).")
+
+    return host, port, user, password, database
+
+def main():
+    host, port, user, password, database = get_db_config()
 
     print(f"🔌 Connexion MySQL -> host={host} port={port} db={database} user={user}")
 
@@ -68,44 +93,14 @@ def main():
         database=database,
         autocommit=False,
     )
-    cur = conn.cursor(dictionary=True)
-
-    cur.execute("""
-        SELECT id, title
-        FROM questions
-        WHERE economicRole = 'all'
-          AND title IS NOT NULL
-          AND title LIKE '[%]%'
-        ORDER BY id ASC
-    """)
-    rows = cur.fetchall()
-    print(f"📦 Lignes à corriger détectées: {len(rows)}")
-
-    updated = 0
-    skipped = 0
-
-    for r in rows:
-        qid = r["id"]
-        title = r["title"] or ""
-        role, clean_title = extract_role_and_clean_title(title)
-
-        if not role:
-            skipped += 1
-            continue
-
-        new_title = clean_title if clean_title else title
-
-        cur.execute(
-            "UPDATE questions SET economicRole=%s, title=%s WHERE id=%s",
-            (role, new_title, qid),
-        )
-        updated += 1
-
-        if updated % 200 == 0:
-            print(f"✅ {updated} lignes mises à jour...")
+    cur = conn.cursor()
+
+    sql, params = build_update_sql()
+    cur.execute(sql, params)
+    updated = cur.rowcount
 
     conn.commit()
-    print(f"✅ Terminé. updated={updated} skipped={skipped}")
+    print(f"✅ Terminé. updated={updated}")
 
     cur.close()
     conn.close()
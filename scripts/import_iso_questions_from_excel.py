@@ -4,7 +4,10 @@ ISO questions importer (ISO 9001 / ISO 13485) for MySQL.
 
 Robust features:
 - header=2
-- purge per referential
+- upsert by questionKey (ON DUPLICATE KEY UPDATE), then remove the
+  referential's questions that are no longer in the sheet
+  (PURGE_BEFORE_IMPORT=1: delete the referential's questions first instead)
+- bulk load via LOAD DATA LOCAL INFILE (falls back to batched INSERTs)
 - auto-create missing processes
 - questionKey = q_ + md5(...)
 - supports process table with/without slug
@@ -19,15 +22,52 @@ import hashlib
 import json
 import os
 import re
-from collections import defaultdict
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import tempfile
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import mysql.connector
+import openpyxl
 import pandas as pd
+from mysql.connector import errorcode
 from mysql.connector.connection import MySQLConnection
 from mysql.connector.cursor import MySQLCursorDict
 
 
+INSERT_BATCH_SIZE = 2000  # default rows per multi-row INSERT (env INSERT_BATCH_SIZE)
+# approx. characters per multi-row INSERT, keeps packets under max_allowed_packet (4MB on older servers)
+INSERT_BATCH_MAX_CHARS = 1_000_000
+
+# LOAD DATA LOCAL INFILE refused by server/client -> fall back to batched INSERTs
+LOCAL_INFILE_REFUSED = {
+    errorcode.ER_NOT_ALLOWED_COMMAND,
+    errorcode.ER_CLIENT_LOCAL_FILES_DISABLED,
+    errorcode.CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+}
+
+# field -> accepted Excel headers (compared through normalize_header)
+SHEET_FIELDS: Dict[str, List[str]] = {
+    "process_name": ["Processus concerné", "Processus concerne"],
+    "article": ["Clause"],
+    "title": ["Intitulé", "Intitule"],
+    "question_text": ["Question d’audit détaillée", "Question d'audit détaillée", "Question d audit detaillee"],
+    "expected": ["Preuves attendues"],
+    "interview": ["Fonctions interrogées", "Fonctions interrogees"],
+    "criticality": ["Criticité", "Criticite"],
+    "risk": ["Risque"],
+    "question_type": ["Type"],
+    "iso14971": ["ISO14971"],
+    "mdr": ["MDR"],
+}
+
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]+")
+_SPLIT_RE = re.compile(r"[,;/|]")
+_WS_RE = re.compile(r"\s+")
+_HEADER_CHARS = str.maketrans(
+    {"’": "'", "`": "'", "é": "e", "è": "e", "ê": "e", "à": "a", "ù": "u", "î": "i", "ï": "i"}
+)
+
+
 def getenv_str(name: str, default: str) -> str:
     value = os.getenv(name)
     if value is None:
@@ -48,55 +88,33 @@ def getenv_int(name: str, default: int) -> int:
 
 
 def slugify(value: str) -> str:
-    value = re.sub(r"[^a-zA-Z0-9]+", "-", value.strip().lower())
-    return value.strip("-")
+    """Expects an already stripped, lower-cased value (see ensure_process_ids)."""
+    return _SLUG_RE.sub("-", value).strip("-")
 
 
 def normalize_header(value: str) -> str:
-    value = (value or "").strip().lower()
-    value = (
-        value.replace("’", "'")
-        .replace("`", "'")
-        .replace("é", "e")
-        .replace("è", "e")
-        .replace("ê", "e")
-        .replace("à", "a")
-        .replace("ù", "u")
-        .replace("î", "i")
-        .replace("ï", "i")
-    )
-    value = re.sub(r"\s+", " ", value)
-    return value
-
-
-def norm_criticality(value: str) -> str:
-    val = (value or "").strip().lower()
-    mapping = {
-        "haute": "high",
-        "elevee": "high",
-        "élevee": "high",
-        "élevée": "high",
-        "high": "high",
-        "moyenne": "medium",
-        "medium": "medium",
-        "faible": "low",
-        "low": "low",
-        "critique": "high",
-    }
-    return mapping.get(val, "medium")
+    value = (value or "").strip().lower().translate(_HEADER_CHARS)
+    return _WS_RE.sub(" ", value)
 
 
-def str_or_none(value: Any) -> Optional[str]:
-    if pd.isna(value):
-        return None
-    text = str(value).strip()
-    return text if text else None
+CRITICALITY_MAP = {
+    "haute": "high",
+    "elevee": "high",
+    "élevee": "high",
+    "élevée": "high",
+    "high": "high",
+    "moyenne": "medium",
+    "medium": "medium",
+    "faible": "low",
+    "low": "low",
+    "critique": "high",
+}
 
 
-def split_list(value: Optional[str]) -> List[str]:
-    if not value:
-        return []
-    return [part.strip() for part in re.split(r"[,;/|]", value) if part and part.strip()]
+@lru_cache(maxsize=4096)
+def json_list(items: Tuple[str, ...]) -> str:
+    # same few lists repeat across rows (functions, process names) -> encode each once
+    return json.dumps(list(items), ensure_ascii=False)
 
 
 def quote_identifier(name: str) -> str:
@@ -132,17 +150,66 @@ def get_required_env() -> Tuple[str, int, bool, Dict[str, Any]]:
     return excel_path, referential_id, dry_run, db_config
 
 
-def build_sheet(path: str) -> pd.DataFrame:
-    return pd.read_excel(path, header=2)
+def build_sheet(
+    path: str, header_row: int = 2, usecols: Optional[Callable[[str], bool]] = None
+) -> pd.DataFrame:
+    """
+    Same columns as pd.read_excel(path, header=2), streamed with openpyxl in
+    read-only mode ('Unnamed: n' / 'name.1' headers). Like pandas, the header is
+    the raw row header_row (blank rows above it count); blank data rows are dropped.
+    As with pandas' usecols callable, only the columns whose header passes usecols
+    are kept. The patch_iso_risks scripts read the sheet through this function too.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        for _ in range(header_row):
+            next(rows, None)
+        header = list(next(rows, ()))
+
+        columns: List[str] = []
+        for i, name in enumerate(header):
+            name = f"Unnamed: {i}" if name is None else name
+            base, n = name, 0
+            while name in columns:
+                n += 1
+                name = f"{base}.{n}"
+            columns.append(name)
+
+        keep = [i for i, name in enumerate(columns) if usecols is None or usecols(name)]
+        records = [
+            tuple(r[i] if i < len(r) else None for i in keep)
+            for r in rows
+            if any(v is not None and v != "" for v in r)
+        ]
+    finally:
+        wb.close()
+
+    # explicit index: keeps the row count even when no column is kept
+    return pd.DataFrame.from_records(
+        records, columns=[columns[i] for i in keep], index=pd.RangeIndex(len(records))
+    ).infer_objects()
+
+
+def sheet_fields(sheet: pd.DataFrame, fields: Dict[str, List[str]]) -> pd.DataFrame:
+    """
+    Resolve each field by its header aliases (headers normalized once per import):
+    stripped text per row, <NA> when empty or when no header matches.
+    """
+    normalized = {normalize_header(str(col)): col for col in sheet.columns}
+    out: Dict[str, pd.Series] = {}
+    for field, aliases in fields.items():
+        col = next((normalized[k] for k in map(normalize_header, aliases) if k in normalized), None)
+        if col is None:
+            out[field] = pd.Series(pd.NA, index=sheet.index, dtype="string")
+        else:
+            out[field] = sheet[col].astype("string").str.strip().replace("", pd.NA)
+    return pd.DataFrame(out, index=sheet.index)
 
 
-def resolve_sheet_value(row: pd.Series, aliases: List[str]) -> Optional[str]:
-    normalized = {normalize_header(str(col)): col for col in row.index}
-    for alias in aliases:
-        col = normalized.get(normalize_header(alias))
-        if col is not None:
-            return str_or_none(row.get(col))
-    return None
+def to_params(series: pd.Series) -> List[Any]:
+    """Series -> list of plain Python values (NA becomes None) for the DB driver."""
+    return series.astype(object).where(series.notna(), None).tolist()
 
 
 def _pick_field(row: Optional[Dict[str, Any]], *names: str) -> Optional[Any]:
@@ -156,56 +223,42 @@ def _pick_field(row: Optional[Dict[str, Any]], *names: str) -> Optional[Any]:
     return None
 
 
-def table_exists(cur: MySQLCursorDict, db_name: str, table: str) -> bool:
-    cur.execute(
-        """
-        SELECT COUNT(*) AS c
-        FROM information_schema.tables
-        WHERE table_schema=%s AND table_name=%s
-        """,
-        (db_name, table),
-    )
-    row = cur.fetchone()
-    return bool(row and int(_pick_field(row, "c", "C") or 0) > 0)
+SCHEMA_TABLES = ("questions", "processus", "processes", "referentials")
 
 
-def resolve_table_columns(cur: MySQLCursorDict, db_name: str, table_name: str) -> List[Dict[str, Any]]:
+def load_schema(cur: MySQLCursorDict, db_name: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Columns of every table the importer touches, in one information_schema round-trip."""
+    placeholders = ", ".join(["%s"] * len(SCHEMA_TABLES))
     cur.execute(
-        """
+        f"""
         SELECT
+          TABLE_NAME AS table_name,
           COLUMN_NAME AS column_name,
           IS_NULLABLE AS is_nullable,
           DATA_TYPE AS data_type,
           COLUMN_TYPE AS column_type
         FROM information_schema.columns
-        WHERE table_schema = %s AND table_name = %s
+        WHERE table_schema = %s AND table_name IN ({placeholders})
+        ORDER BY ORDINAL_POSITION
         """,
-        (db_name, table_name),
+        (db_name, *SCHEMA_TABLES),
     )
-    return cur.fetchall()
+    schema: Dict[str, List[Dict[str, Any]]] = {}
+    for r in cur.fetchall():
+        table_name = str(_pick_field(r, "table_name", "TABLE_NAME") or "")
+        schema.setdefault(table_name, []).append(r)
+    return schema
 
 
-def resolve_process_table(cur: MySQLCursorDict, db_name: str) -> str:
-    cur.execute(
-        """
-        SELECT table_name AS table_name
-        FROM information_schema.tables
-        WHERE table_schema = %s
-          AND table_name IN ('processus', 'processes')
-        ORDER BY CASE table_name WHEN 'processus' THEN 0 ELSE 1 END
-        LIMIT 1
-        """,
-        (db_name,),
-    )
-    row = cur.fetchone()
-    table_name = _pick_field(row, "table_name", "TABLE_NAME")
-    if not table_name:
-        raise SystemExit("Table process manquante (attendu: processus ou processes)")
-    return str(table_name)
+def resolve_process_table(schema: Dict[str, List[Dict[str, Any]]]) -> str:
+    for table_name in ("processus", "processes"):
+        if schema.get(table_name):
+            return table_name
+    raise SystemExit("Table process manquante (attendu: processus ou processes)")
 
 
-def resolve_process_columns(cur: MySQLCursorDict, db_name: str, process_table: str) -> set[str]:
-    rows = resolve_table_columns(cur, db_name, process_table)
+def resolve_process_columns(schema: Dict[str, List[Dict[str, Any]]], process_table: str) -> set[str]:
+    rows = schema.get(process_table, [])
     cols: set[str] = set()
     for r in rows:
         col = _pick_field(r, "column_name", "COLUMN_NAME")
@@ -216,8 +269,10 @@ def resolve_process_columns(cur: MySQLCursorDict, db_name: str, process_table: s
     return cols
 
 
-def resolve_questions_columns(cur: MySQLCursorDict, db_name: str) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
-    rows = resolve_table_columns(cur, db_name, "questions")
+def resolve_questions_columns(
+    schema: Dict[str, List[Dict[str, Any]]],
+) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    rows = schema.get("questions", [])
 
     q_columns: set[str] = set()
     meta: Dict[str, Dict[str, Any]] = {}
@@ -273,11 +328,12 @@ def resolve_questions_columns(cur: MySQLCursorDict, db_name: str) -> Tuple[Dict[
 def ensure_referential_exists(
     *,
     cur: MySQLCursorDict,
-    db_name: str,
+    schema: Dict[str, List[Dict[str, Any]]],
     referential_id: int,
     dry_run: bool,
 ) -> None:
-    if not table_exists(cur, db_name, "referentials"):
+    cols_info = schema.get("referentials")
+    if not cols_info:
         raise SystemExit("Table 'referentials' introuvable (FK referentialId -> referentials.id).")
 
     cur.execute("SELECT id FROM referentials WHERE id = %s", (referential_id,))
@@ -289,8 +345,6 @@ def ensure_referential_exists(
     ref_code = "ISO9001" if referential_id == 2 else "ISO13485"
     ref_desc = "Imported by ISO Excel importer"
 
-    cols_info = resolve_table_columns(cur, db_name, "referentials")
-
     cols_meta: Dict[str, Dict[str, str]] = {}
     cols: set[str] = set()
     for r in cols_info:
@@ -376,44 +430,207 @@ def ensure_referential_exists(
 
 
 def load_process_map(cur: MySQLCursorDict, process_table: str) -> Dict[str, int]:
-    cur.execute(f"SELECT id, name FROM {quote_identifier(process_table)}")
-    return {str(r["name"]).strip().lower(): int(r["id"]) for r in cur.fetchall()}
+    # lookup key (trimmed, lower-case name) is computed server-side
+    cur.execute(f"SELECT id, LOWER(TRIM(name)) AS k FROM {quote_identifier(process_table)}")
+    return {r["k"]: int(r["id"]) for r in cur.fetchall()}
 
 
-def ensure_process_id(
+def ensure_process_ids(
     *,
     cur: MySQLCursorDict,
     process_table: str,
     process_columns: set[str],
     process_map: Dict[str, int],
-    process_name: str,
+    process_names: Iterable[str],
     dry_run: bool,
-) -> int:
-    key = process_name.strip().lower()
-    existing = process_map.get(key)
-    if existing is not None:
-        return existing
+) -> Dict[str, int]:
+    """
+    Map each process name to its id. Unknown names are created in a single
+    batched INSERT (first spelling wins), then only those rows are read back.
+    """
+    keys = {name: name.strip().lower() for name in process_names}
+    missing: Dict[str, str] = {}
+    for name, key in keys.items():
+        if key not in process_map and key not in missing:
+            missing[key] = name
+
+    if missing and dry_run:
+        for key in missing:
+            process_map[key] = int(hashlib.md5(key.encode("utf-8"), usedforsecurity=False).hexdigest()[:8], 16)
+    elif missing:
+        if "slug" in process_columns:
+            cur.executemany(
+                f"INSERT INTO {quote_identifier(process_table)}(name, slug) VALUES (%s, %s)",
+                [(name, slugify(key)) for key, name in missing.items()],
+            )
+        else:
+            cur.executemany(
+                f"INSERT INTO {quote_identifier(process_table)}(name) VALUES (%s)",
+                [(name,) for name in missing.values()],
+            )
+        placeholders = ", ".join(["%s"] * len(missing))
+        cur.execute(
+            f"SELECT id, LOWER(TRIM(name)) AS k FROM {quote_identifier(process_table)} WHERE name IN ({placeholders})",
+            tuple(missing.values()),
+        )
+        process_map.update({r["k"]: int(r["id"]) for r in cur.fetchall()})
+        print(f"Created {len(missing)} missing process(es) in {process_table}")
 
-    if dry_run:
-        deterministic = int(hashlib.md5(key.encode("utf-8")).hexdigest()[:8], 16)
-        process_map[key] = deterministic
-        return deterministic
+    return {name: process_map[key] for name, key in keys.items()}
 
-    if "slug" in process_columns:
-        slug = slugify(process_name)
-        cur.execute(
-            f"INSERT INTO {quote_identifier(process_table)}(name, slug) VALUES (%s, %s)",
-            (process_name, slug),
+
+def build_question_keys(
+    referential_id: int,
+    articles: Iterable[str],
+    process_ids: Iterable[int],
+    question_texts: Iterable[str],
+) -> List[str]:
+    """questionKey = q_ + md5("referentialId|article|processId|questionText") for every row."""
+    prefix = hashlib.md5(f"{referential_id}|".encode("utf-8"), usedforsecurity=False)
+    keys: List[str] = []
+    for article, process_id, question_text in zip(articles, process_ids, question_texts):
+        h = prefix.copy()
+        h.update(f"{article}|{process_id}|{question_text}".encode("utf-8"))
+        keys.append("q_" + h.hexdigest())
+    return keys
+
+
+def tsv_field(value: Any) -> str:
+    if value is None:
+        return r"\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def load_data_local_infile(
+    cur: MySQLCursorDict,
+    table: str,
+    columns: List[str],
+    params: List[Tuple[Any, ...]],
+) -> bool:
+    """
+    Bulk-load rows through a temporary TSV file (\\N = NULL).
+    Returns False when LOCAL INFILE is not allowed, so the caller can fall back to INSERTs.
+    LOCAL implies IGNORE (duplicate keys skipped, bad values truncated with a warning
+    only): any warning or missing row raises, like the strict-mode INSERTs would.
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", newline="", delete=False) as f:
+        for row in params:
+            f.write("\t".join(tsv_field(v) for v in row))
+            f.write("\n")
+        tsv_path = f.name
+
+    cols_sql = ", ".join(quote_identifier(c) for c in columns)
+    sql = (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {quote_identifier(table)} CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+        f"({cols_sql})"
+    )
+    try:
+        cur.execute(sql, (tsv_path,))
+    except mysql.connector.Error as e:
+        if e.errno not in LOCAL_INFILE_REFUSED:
+            raise
+        print(f"[WARN] LOAD DATA LOCAL INFILE unavailable ({e.errno}), falling back to batched INSERTs")
+        return False
+    finally:
+        os.unlink(tsv_path)
+
+    loaded = cur.rowcount
+    cur.execute("SHOW WARNINGS")
+    warnings = [w for w in cur.fetchall() if _pick_field(w, "Level") != "Note"]
+    if loaded != len(params) or warnings:
+        details = "; ".join(
+            f"{_pick_field(w, 'Code')} {_pick_field(w, 'Message')}" for w in warnings[:5]
         )
-    else:
-        cur.execute(
-            f"INSERT INTO {quote_identifier(process_table)}(name) VALUES (%s)",
-            (process_name,),
+        raise RuntimeError(
+            f"LOAD DATA into {table} loaded {loaded}/{len(params)} rows with {len(warnings)} warning(s): {details}"
         )
+    return True
+
+
+def iter_batches(params: List[Tuple[Any, ...]], max_rows: int) -> Iterable[List[Tuple[Any, ...]]]:
+    batch: List[Tuple[Any, ...]] = []
+    size = 0
+    for row in params:
+        row_size = sum(len(str(v)) for v in row if v is not None)
+        if batch and (len(batch) >= max_rows or size + row_size > INSERT_BATCH_MAX_CHARS):
+            yield batch
+            batch, size = [], 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        yield batch
+
+
+def staging_upsert_sql(columns: List[str], key_column: str) -> str:
+    """
+    INSERT ... SELECT from questions_staging. Both tables have the same columns, so
+    MySQL needs every column of the ON DUPLICATE KEY UPDATE list qualified (else ERROR 1052).
+    """
+    cols_sql = ", ".join(quote_identifier(c) for c in columns)
+    select_sql = ", ".join(f"s.{quote_identifier(c)}" for c in columns)
+    on_duplicate = ", ".join(
+        f"questions.{quote_identifier(c)} = s.{quote_identifier(c)}" for c in columns if c != key_column
+    )
+    return (
+        f"INSERT INTO questions ({cols_sql}) SELECT {select_sql} FROM questions_staging AS s "
+        f"ON DUPLICATE KEY UPDATE {on_duplicate}"
+    )
+
 
-    process_id = int(cur.lastrowid)
-    process_map[key] = process_id
-    return process_id
+def upsert_via_staging(
+    cur: MySQLCursorDict,
+    columns: List[str],
+    params: List[Tuple[Any, ...]],
+    key_column: str,
+) -> bool:
+    """
+    LOAD DATA cannot upsert: load into a temporary copy of questions, then
+    INSERT ... SELECT ... ON DUPLICATE KEY UPDATE into the real table.
+    """
+    cur.execute("CREATE TEMPORARY TABLE questions_staging LIKE questions")
+    try:
+        if not load_data_local_infile(cur, "questions_staging", columns, params):
+            return False
+        cur.execute(staging_upsert_sql(columns, key_column))
+        return True
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS questions_staging")
+
+
+def purge_stale_questions(
+    cur: MySQLCursorDict,
+    q_cols: Dict[str, str],
+    referential_id: int,
+    keep_keys: set[str],
+) -> int:
+    """Delete the referential's questions whose questionKey is not part of this import."""
+    ref_col = quote_identifier(q_cols["referential"])
+    key_col = quote_identifier(q_cols["question_key"])
+    cur.execute(f"SELECT {key_col} AS question_key FROM questions WHERE {ref_col} = %s", (referential_id,))
+    stale = [r["question_key"] for r in cur.fetchall() if r["question_key"] not in keep_keys]
+
+    removed = 0
+    if None in stale:
+        cur.execute(f"DELETE FROM questions WHERE {ref_col} = %s AND {key_col} IS NULL", (referential_id,))
+        removed += cur.rowcount
+
+    keys = [k for k in stale if k is not None]
+    for start in range(0, len(keys), INSERT_BATCH_SIZE):
+        chunk = keys[start:start + INSERT_BATCH_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(
+            f"DELETE FROM questions WHERE {ref_col} = %s AND {key_col} IN ({placeholders})",
+            (referential_id, *chunk),
+        )
+        removed += cur.rowcount
+    return removed
 
 
 def count_questions(cur: MySQLCursorDict, q_cols: Dict[str, str], referential_id: int) -> int:
@@ -425,6 +642,8 @@ def count_questions(cur: MySQLCursorDict, q_cols: Dict[str, str], referential_id
 
 def main() -> None:
     excel_path, referential_id, dry_run, db_config = get_required_env()
+    batch_size = max(1, getenv_int("INSERT_BATCH_SIZE", INSERT_BATCH_SIZE))
+    purge_before = getenv_str("PURGE_BEFORE_IMPORT", "0") == "1"
     sheet = build_sheet(excel_path)
 
     conn: Optional[MySQLConnection] = None
@@ -437,14 +656,15 @@ def main() -> None:
         print(f"Dry-run: {dry_run}")
         print(f"DB: {db_config['host']}:{db_config['port']} / {db_config['database']} (user={db_config['user']})")
 
-        conn = mysql.connector.connect(**db_config)
+        conn = mysql.connector.connect(**db_config, autocommit=False, allow_local_infile=True)
         cur = conn.cursor(dictionary=True)
 
-        ensure_referential_exists(cur=cur, db_name=db_config["database"], referential_id=referential_id, dry_run=dry_run)
+        schema = load_schema(cur, db_config["database"])
+        ensure_referential_exists(cur=cur, schema=schema, referential_id=referential_id, dry_run=dry_run)
 
-        process_table = resolve_process_table(cur, db_config["database"])
-        process_columns = resolve_process_columns(cur, db_config["database"], process_table)
-        q_cols, q_meta = resolve_questions_columns(cur, db_config["database"])
+        process_table = resolve_process_table(schema)
+        process_columns = resolve_process_columns(schema, process_table)
+        q_cols, q_meta = resolve_questions_columns(schema)
         process_map = load_process_map(cur, process_table)
 
         before = count_questions(cur, q_cols, referential_id)
@@ -457,97 +677,125 @@ def main() -> None:
             economic_role_is_nullable = q_meta[economic_role_col]["is_nullable"]
         print(f"EconomicRole column: {economic_role_col} (nullable={economic_role_is_nullable})")
 
-        if not dry_run:
-            purge_sql = f"DELETE FROM questions WHERE {quote_identifier(q_cols['referential'])} = %s"
-            cur.execute(purge_sql, (referential_id,))
-            print(f"Purged existing questions for referential {referential_id}")
-
-        orders: defaultdict[Tuple[int, str], int] = defaultdict(int)
-        inserted = 0
-        skipped = 0
-
-        for _, row in sheet.iterrows():
-            process_name = resolve_sheet_value(row, ["Processus concerné", "Processus concerne"])
-            article = resolve_sheet_value(row, ["Clause"]) or "N/A"
-            title = resolve_sheet_value(row, ["Intitulé", "Intitule"]) or ""
-            question_text = resolve_sheet_value(
-                row,
-                ["Question d’audit détaillée", "Question d'audit détaillée", "Question d audit detaillee"],
-            ) or ""
-
-            if not process_name or not question_text:
-                skipped += 1
-                continue
-
-            process_id = ensure_process_id(
-                cur=cur,
-                process_table=process_table,
-                process_columns=process_columns,
-                process_map=process_map,
-                process_name=process_name,
-                dry_run=dry_run,
+        insert_cols: List[str] = [
+            q_cols[k] for k in ("referential", "process", "article", "question_text", "question_key", "display_order")
+        ]
+        for k in ("title", "expected", "interview", "criticality", "risk", "question_type", "annexe"):
+            if k in q_cols:
+                insert_cols.append(q_cols[k])
+        if economic_role_col:
+            insert_cols.append(economic_role_col)
+        if "applicable" in q_cols:
+            insert_cols.append(q_cols["applicable"])
+
+        cols_sql = ", ".join(quote_identifier(c) for c in insert_cols)
+        placeholders = ", ".join(["%s"] * len(insert_cols))
+        # batched INSERT ... VALUES fallback only (the staging path builds its own qualified list)
+        on_duplicate = ", ".join(
+            f"{quote_identifier(c)} = VALUES({quote_identifier(c)})" for c in insert_cols if c != q_cols["question_key"]
+        )
+        insert_sql = f"INSERT INTO questions ({cols_sql}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {on_duplicate}"
+
+        fields = sheet_fields(sheet, SHEET_FIELDS)
+        keep = fields["process_name"].notna() & fields["question_text"].notna()
+        skipped = int((~keep).sum())
+
+        if not keep.any():
+            # wrong header row / empty sheet: importing nothing would purge the whole referential
+            raise SystemExit(
+                f"No question rows parsed from {excel_path} (headers: {list(sheet.columns)}); "
+                "refusing to import"
             )
 
-            expected_evidence = resolve_sheet_value(row, ["Preuves attendues"])
-            interview_functions_raw = resolve_sheet_value(row, ["Fonctions interrogées", "Fonctions interrogees"])
-            interview_functions = split_list(interview_functions_raw)
-            criticality = norm_criticality(resolve_sheet_value(row, ["Criticité", "Criticite"]) or "")
-            risk = resolve_sheet_value(row, ["Risque"])
-            question_type = (resolve_sheet_value(row, ["Type"]) or "check").strip().lower()
-
-            iso14971 = resolve_sheet_value(row, ["ISO14971"])
-            mdr = resolve_sheet_value(row, ["MDR"])
-            annexe = " | ".join([x for x in [iso14971, mdr] if x]) or None
-
-            key_raw = f"{referential_id}|{article}|{process_id}|{question_text}"
-            question_key = "q_" + hashlib.md5(key_raw.encode("utf-8")).hexdigest()
-
-            orders[(process_id, article)] += 1
-            display_order = orders[(process_id, article)]
-
-            values: Dict[str, Any] = {
-                q_cols["referential"]: referential_id,
-                q_cols["process"]: process_id,
-                q_cols["article"]: article,
-                q_cols["question_text"]: question_text,
-                q_cols["question_key"]: question_key,
-                q_cols["display_order"]: display_order,
-            }
-
-            if "title" in q_cols:
-                values[q_cols["title"]] = title
-            if "expected" in q_cols:
-                values[q_cols["expected"]] = expected_evidence
-            if "interview" in q_cols:
-                values[q_cols["interview"]] = json.dumps(interview_functions, ensure_ascii=False)
-            if "criticality" in q_cols:
-                values[q_cols["criticality"]] = criticality
-            if "risk" in q_cols:
-    # si la colonne DB ciblée est `risks` (plural), on stocke un JSON string ["..."]
+        rows = fields[keep].copy()
+        rows["article"] = rows["article"].fillna("N/A")
+        rows["title"] = rows["title"].fillna("")
+
+        process_ids = ensure_process_ids(
+            cur=cur,
+            process_table=process_table,
+            process_columns=process_columns,
+            process_map=process_map,
+            process_names=rows["process_name"].unique(),
+            dry_run=dry_run,
+        )
+        rows["process_id"] = rows["process_name"].map(process_ids).astype("int64")
+        rows["display_order"] = rows.groupby(["process_id", "article"], sort=False).cumcount() + 1
+
+        question_keys = build_question_keys(
+            referential_id, rows["article"], rows["process_id"], rows["question_text"]
+        )
+
+        columns: Dict[str, List[Any]] = {
+            q_cols["referential"]: [referential_id] * len(rows),
+            q_cols["process"]: rows["process_id"].tolist(),
+            q_cols["article"]: rows["article"].tolist(),
+            q_cols["question_text"]: rows["question_text"].tolist(),
+            q_cols["question_key"]: question_keys,
+            q_cols["display_order"]: rows["display_order"].tolist(),
+        }
+
+        if "title" in q_cols:
+            columns[q_cols["title"]] = rows["title"].tolist()
+        if "expected" in q_cols:
+            columns[q_cols["expected"]] = to_params(rows["expected"])
+        if "interview" in q_cols:
+            parts = rows["interview"].str.split(_SPLIT_RE).explode().str.strip()
+            parts = parts[parts.notna() & (parts != "")]
+            functions = parts.groupby(level=0, sort=False).agg(tuple).reindex(rows.index)
+            columns[q_cols["interview"]] = [
+                json_list(items if isinstance(items, tuple) else ()) for items in functions
+            ]
+        if "criticality" in q_cols:
+            # cells are already stripped by sheet_fields; unknown/empty -> medium
+            criticality = rows["criticality"].str.lower().map(CRITICALITY_MAP).fillna("medium")
+            columns[q_cols["criticality"]] = criticality.tolist()
+        if "risk" in q_cols:
+            risks = to_params(rows["risk"])
+            # si la colonne DB ciblée est `risks` (plural), on stocke un JSON string ["..."]
             if q_cols["risk"] == "risks":
-              values[q_cols["risk"]] = json.dumps([risk], ensure_ascii=False) if risk else None
-            else:
-              values[q_cols["risk"]] = risk
-            if "question_type" in q_cols:
-                values[q_cols["question_type"]] = question_type
-            if "annexe" in q_cols:
-                values[q_cols["annexe"]] = annexe
-
-            if economic_role_col:
-                values[economic_role_col] = "N/A" if economic_role_is_nullable == "NO" else None
-
-            if "applicable" in q_cols:
-                values[q_cols["applicable"]] = json.dumps([process_name], ensure_ascii=False)
-
-            inserted += 1
-            if not dry_run:
-                cols = ", ".join(quote_identifier(c) for c in values.keys())
-                placeholders = ", ".join(["%s"] * len(values))
-                sql = f"INSERT INTO questions ({cols}) VALUES ({placeholders})"
-                cur.execute(sql, tuple(values.values()))
+                risks = [json_list((r,)) if r else None for r in risks]
+            columns[q_cols["risk"]] = risks
+        if "question_type" in q_cols:
+            columns[q_cols["question_type"]] = rows["question_type"].fillna("check").str.lower().tolist()
+        if "annexe" in q_cols:
+            iso14971, mdr = rows["iso14971"], rows["mdr"]
+            annexe = iso14971.where(mdr.isna(), iso14971 + " | " + mdr).fillna(mdr)
+            columns[q_cols["annexe"]] = to_params(annexe)
+
+        if economic_role_col:
+            columns[economic_role_col] = ["N/A" if economic_role_is_nullable == "NO" else None] * len(rows)
+
+        if "applicable" in q_cols:
+            columns[q_cols["applicable"]] = [json_list((name,)) for name in rows["process_name"]]
+
+        params = list(zip(*(columns[c] for c in insert_cols)))
+        inserted = len(params)
 
         if not dry_run:
-            conn.commit()
+            # single transaction for the whole import; FK targets (referential, processes)
+            # are resolved above. unique_checks stays on: the upsert relies on questionKey.
+            cur.execute("SET SESSION foreign_key_checks = 0")
+            try:
+                if purge_before:
+                    cur.execute(
+                        f"DELETE FROM questions WHERE {quote_identifier(q_cols['referential'])} = %s",
+                        (referential_id,),
+                    )
+                    print(f"Purged questions for referential {referential_id}: {cur.rowcount}")
+                if not upsert_via_staging(cur, insert_cols, params, q_cols["question_key"]):
+                    for batch in iter_batches(params, batch_size):
+                        cur.executemany(insert_sql, batch)
+                if not purge_before:
+                    removed = purge_stale_questions(cur, q_cols, referential_id, set(question_keys))
+                    print(f"Removed questions no longer in the sheet for referential {referential_id}: {removed}")
+                conn.commit()
+            finally:
+                # a failed reset (e.g. lost connection) must not mask the import error
+                try:
+                    cur.execute("SET SESSION foreign_key_checks = 1")
+                except mysql.connector.Error as e:
+                    print(f"[WARN] Could not restore foreign_key_checks: {e}")
 
         after = count_questions(cur, q_cols, referential_id)
         print("=== ISO IMPORT RESULT ===")
@@ -7,6 +7,12 @@ import mysql.connector
 from urllib.parse import urlparse, parse_qs
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
+BATCH_SIZE = max(1, int(os.environ.get("BATCH_SIZE", "1000")))  # rows per multi-row INSERT into the staging table
+
+_WS_RE = re.compile(r"\s+")
+_HEADER_CHARS = str.maketrans(
+    {"’": "'", "é": "e", "è": "e", "ê": "e", "à": "a", "ç": "c", "ù": "u", "ô": "o", "î": "i"}
+)
 
 def parse_db_url(url: str) -> dict:
     u = urlparse(url)
@@ -66,15 +72,11 @@ def norm(v):
     return s
 
 def normalize_header(h: str) -> str:
-    s = str(h).strip().lower()
-    s = s.replace("’", "'")
-    s = (s.replace("é", "e").replace("è", "e").replace("ê", "e")
-           .replace("à", "a").replace("ç", "c").replace("ù", "u").replace("ô", "o").replace("î", "i"))
-    s = re.sub(r"\s+", " ", s)
-    return s
+    s = str(h).strip().lower().translate(_HEADER_CHARS)
+    return _WS_RE.sub(" ", s)
 
-def col(df: pd.DataFrame, candidates: list[str]) -> str | None:
-    norm_map = {normalize_header(c): c for c in df.columns}
+def col(norm_map: dict, candidates: list[str]) -> str | None:
+    # norm_map: {normalize_header(column): column}, built once per sheet
     for cand in candidates:
         k = normalize_header(cand)
         if k in norm_map:
@@ -184,27 +186,33 @@ def build_process_map(cur) -> dict:
     return mp
 
 def load_rows_from_excel(df: pd.DataFrame, referential_id: int):
-    c_process = col(df, ["Processus concerné", "Processus concerne", "Processus"])
-    c_clause = col(df, ["Clause ISO 9001"]) if referential_id == 2 else col(df, ["Clause ISO 13485"])
-    c_title = col(df, ["Intitulé", "Intitule", "Intitulé de la question"])
-    c_qtext = col(df, ["Question d’audit détaillée", "Question d'audit détaillée", "Question audit détaillée"])
-    c_type = col(df, ["Type"])
-    c_risk = col(df, ["Risque en cas de NC", "Risque en cas de non conformite", "Risque en cas de non-conformité", "Risque"])
-    c_evid = col(df, ["Éléments de preuve attendus", "Elements de preuve attendus", "Preuves attendues", "Éléments de preuve"])
-    c_funcs = col(df, ["Fonctions interrogées", "Fonctions interrogees", "Fonctions"])
-    c_qk = col(df, ["questionKey", "QuestionKey", "question_key"])
+    norm_map = {normalize_header(c): c for c in df.columns}
+    c_process = col(norm_map, ["Processus concerné", "Processus concerne", "Processus"])
+    c_clause = col(norm_map, ["Clause ISO 9001"]) if referential_id == 2 else col(norm_map, ["Clause ISO 13485"])
+    c_title = col(norm_map, ["Intitulé", "Intitule", "Intitulé de la question"])
+    c_qtext = col(norm_map, ["Question d’audit détaillée", "Question d'audit détaillée", "Question audit détaillée"])
+    c_type = col(norm_map, ["Type"])
+    c_risk = col(norm_map, ["Risque en cas de NC", "Risque en cas de non conformite", "Risque en cas de non-conformité", "Risque"])
+    c_evid = col(norm_map, ["Éléments de preuve attendus", "Elements de preuve attendus", "Preuves attendues", "Éléments de preuve"])
+    c_funcs = col(norm_map, ["Fonctions interrogées", "Fonctions interrogees", "Fonctions"])
+    c_qk = col(norm_map, ["questionKey", "QuestionKey", "question_key"])
+
+    pos = {c: i for i, c in enumerate(df.columns)}
+
+    def get(values, c):
+        return norm(values[pos[c]]) if c else None
 
     rows = []
-    for _, r in df.iterrows():
-        qk = norm(r.get(c_qk)) if c_qk else None
-        process_name = norm(r.get(c_process)) if c_process else None
-        article = norm(r.get(c_clause)) if c_clause else None
-        title = norm(r.get(c_title)) if c_title else None
-        qtext = norm(r.get(c_qtext)) if c_qtext else None
-        qtype = norm(r.get(c_type)) if c_type else None
-        risk = norm(r.get(c_risk)) if c_risk else None
-        evid = norm(r.get(c_evid)) if c_evid else None
-        funcs = norm(r.get(c_funcs)) if c_funcs else None
+    for values in df.itertuples(index=False, name=None):
+        qk = get(values, c_qk)
+        process_name = get(values, c_process)
+        article = get(values, c_clause)
+        title = get(values, c_title)
+        qtext = get(values, c_qtext)
+        qtype = get(values, c_type)
+        risk = get(values, c_risk)
+        evid = get(values, c_evid)
+        funcs = get(values, c_funcs)
 
         if not qk:
             qk = stable_question_key(referential_id, slugify(process_name or ""), article or "", title or "", qtext or "")
@@ -227,8 +235,52 @@ def load_rows_from_excel(df: pd.DataFrame, referential_id: int):
     print(f"[EXCEL] referentialId={referential_id} rows={len(rows)} risk_non_empty={non_empty_risk} evid_non_empty={non_empty_evid}")
     return rows
 
-def upsert_fill_only(df: pd.DataFrame, referential_id: int):
-    conn = connect_with_retry()
+def key_column_type(cur) -> str:
+    # staging questionKey gets the charset/collation of questions.questionKey:
+    # the UPDATE ... JOIN then compares both sides in one collation (no ERROR 1267)
+    cur.execute("""
+      SELECT CHARACTER_SET_NAME, COLLATION_NAME FROM INFORMATION_SCHEMA.COLUMNS
+      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'questions' AND COLUMN_NAME = 'questionKey'
+    """)
+    row = cur.fetchone()
+    if row and row[0] and row[1]:
+        return f"VARCHAR(255) CHARACTER SET {row[0]} COLLATE {row[1]}"
+    return "VARCHAR(255)"
+
+def apply_updates(cur, referential_id: int, values_by_key: dict):
+    """Stage (questionKey, new values) in a temporary table, then update every row with one UPDATE ... JOIN."""
+    cur.execute(f"""
+      CREATE TEMPORARY TABLE iso_update_values (
+        questionKey {key_column_type(cur)} NOT NULL PRIMARY KEY,
+        processId BIGINT NULL, article LONGTEXT NULL, title LONGTEXT NULL, questionText LONGTEXT NULL,
+        questionType LONGTEXT NULL, interviewFunctions LONGTEXT NULL,
+        risk LONGTEXT NULL, expectedEvidence LONGTEXT NULL
+      )
+    """)
+    try:
+        insert_sql = """
+          INSERT INTO iso_update_values
+            (questionKey, processId, article, title, questionText, questionType, interviewFunctions, risk, expectedEvidence)
+          VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        rows = list(values_by_key.values())
+        for start in range(0, len(rows), BATCH_SIZE):
+            # mysql-connector rewrites executemany INSERTs into one multi-row INSERT
+            cur.executemany(insert_sql, rows[start:start + BATCH_SIZE])
+
+        # ✅ keep alignment safe (no criticality!)
+        # risk/expectedEvidence are NULL when they must not be filled -> COALESCE keeps the DB value
+        cur.execute("""
+          UPDATE questions q JOIN iso_update_values u ON q.questionKey = u.questionKey
+          SET q.processId=u.processId, q.article=u.article, q.title=u.title, q.questionText=u.questionText,
+              q.questionType=u.questionType, q.interviewFunctions=u.interviewFunctions,
+              q.risk=COALESCE(u.risk, q.risk), q.expectedEvidence=COALESCE(u.expectedEvidence, q.expectedEvidence)
+          WHERE q.referentialId=%s
+        """, (referential_id,))
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS iso_update_values")
+
+def upsert_fill_only(conn, df: pd.DataFrame, referential_id: int):
     cur = conn.cursor()
 
     process_map = build_process_map(cur)
@@ -244,12 +296,23 @@ def upsert_fill_only(df: pd.DataFrame, referential_id: int):
     total, risk_empty, evid_empty = cur.fetchone()
     print(f"[DB] referentialId={referential_id} total={total} risk_empty={risk_empty} evid_empty={evid_empty}")
 
+    # one SELECT for the whole referential instead of one SELECT per Excel row
+    cur.execute("""
+      SELECT questionKey, risk, expectedEvidence
+      FROM questions
+      WHERE referentialId=%s
+    """, (referential_id,))
+    existing_by_key = {str(k).lower(): (r, e) for k, r, e in cur.fetchall() if k}
+
     updated_any = 0
     updated_risk = 0
     updated_evid = 0
     not_found = 0
     skip_no_process = 0
 
+    # new values per questionKey (lower-cased like existing_by_key), applied in one UPDATE at the end
+    values_by_key = {}
+
     for row in rows:
         p = row["process"]
         pid = None
@@ -261,18 +324,12 @@ def upsert_fill_only(df: pd.DataFrame, referential_id: int):
 
         qk = row["questionKey"]
 
-        cur.execute("""
-          SELECT id, risk, expectedEvidence
-          FROM questions
-          WHERE questionKey=%s AND referentialId=%s
-          LIMIT 1
-        """, (qk, referential_id))
-        existing = cur.fetchone()
+        existing = existing_by_key.get(qk.lower())
         if not existing:
             not_found += 1
             continue
 
-        _id, db_risk, db_evid = existing
+        db_risk, db_evid = existing
 
         set_risk = (db_risk is None or str(db_risk).strip() == "") and (row["risk"] is not None and row["risk"] != "")
         set_evid = (db_evid is None or str(db_evid).strip() == "") and (row["expectedEvidence"] is not None and row["expectedEvidence"] != "")
@@ -280,26 +337,19 @@ def upsert_fill_only(df: pd.DataFrame, referential_id: int):
         if not (set_risk or set_evid):
             continue
 
-        updates = []
-        params = []
-
-        # ✅ keep alignment safe (no criticality!)
-        updates += ["processId=%s", "article=%s", "title=%s", "questionText=%s", "questionType=%s", "interviewFunctions=%s"]
-        params += [pid, row["article"], row["title"], row["questionText"], row["questionType"], row["interviewFunctions"]]
-
-        if set_risk:
-            updates.append("risk=%s")
-            params.append(row["risk"])
-        if set_evid:
-            updates.append("expectedEvidence=%s")
-            params.append(row["expectedEvidence"])
-
-        params += [qk, referential_id]
-
-        cur.execute(
-            f"UPDATE questions SET {', '.join(updates)} WHERE questionKey=%s AND referentialId=%s",
-            tuple(params),
+        new_risk = row["risk"] if set_risk else None
+        new_evid = row["expectedEvidence"] if set_evid else None
+        previous = values_by_key.get(qk.lower())
+        if previous:
+            # same key earlier in the sheet: keep what it filled (the later row's other columns win)
+            new_risk = new_risk if new_risk is not None else previous[7]
+            new_evid = new_evid if new_evid is not None else previous[8]
+        values_by_key[qk.lower()] = (
+            qk, pid, row["article"], row["title"], row["questionText"], row["questionType"], row["interviewFunctions"],
+            new_risk, new_evid,
         )
+        # later Excel rows with the same key must see the values filled above
+        existing_by_key[qk.lower()] = (row["risk"] if set_risk else db_risk, row["expectedEvidence"] if set_evid else db_evid)
 
         updated_any += 1
         if set_risk:
@@ -307,23 +357,32 @@ def upsert_fill_only(df: pd.DataFrame, referential_id: int):
         if set_evid:
             updated_evid += 1
 
-        try:
-            conn.ping(reconnect=True, attempts=2, delay=1)
-        except Exception:
-            pass
+    if values_by_key:
+        apply_updates(cur, referential_id, values_by_key)
 
     conn.commit()
     cur.close()
-    conn.close()
 
     print(f"[RESULT] referentialId={referential_id} updated_any={updated_any} updated_risk={updated_risk} updated_evid={updated_evid} "
           f"not_found_in_db={not_found} skip_no_process={skip_no_process}")
 
+def read_excel(path: str) -> pd.DataFrame:
+    # calamine (Rust parser) is much faster than openpyxl; openpyxl stays the fallback
+    try:
+        return pd.read_excel(path, engine="calamine")
+    except ImportError:
+        return pd.read_excel(path, engine="openpyxl")
+
 def run():
-    iso9001 = pd.read_excel("data/Questionnaires audits iso 9001.xlsx", engine="openpyxl")
-    iso13485 = pd.read_excel("data/Questionnaires audits iso 13485.xlsx", engine="openpyxl")
-    upsert_fill_only(iso9001, 2)
-    upsert_fill_only(iso13485, 3)
+    iso9001 = read_excel("data/Questionnaires audits iso 9001.xlsx")
+    iso13485 = read_excel("data/Questionnaires audits iso 13485.xlsx")
+    # one connection for both referentials (each one is still committed on its own)
+    conn = connect_with_retry()
+    try:
+        upsert_fill_only(conn, iso9001, 2)
+        upsert_fill_only(conn, iso13485, 3)
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     run()
@@ -5,7 +5,8 @@
 Import MDR questions from an Excel file into Railway MySQL.
 
 ✅ Fixes included:
-- Reads Excel with pandas + openpyxl
+- Reads Excel with pandas + calamine (python-calamine), falls back to openpyxl
+  (or a CSV export of the sheet when CSV_PATH is set)
 - Connects to Railway MySQL using env vars (DB_HOST/DB_PORT/DB_USER/DB_PASSWORD/DB_NAME) OR DATABASE_URL
 - Introspects actual DB schema (columns + types) for `processus` and `questions`
 - Full replace: deletes existing questions before importing
@@ -14,6 +15,8 @@ Import MDR questions from an Excel file into Railway MySQL.
 - Detects ENUM columns (criticality/questionType/...) and maps Excel values to allowed enum values
 - Avoids inserting columns that do not exist in DB
 - Generates stable questionKey
+- Bulk-loads questions with LOAD DATA LOCAL INFILE, or inserts them in batches
+  (executemany, BATCH_SIZE rows per multi-row INSERT) when the server refuses it
 
 Expected Excel headers (French):
 Processus concerné | Objectif du processus | Clause MDR | Intitulé | Question d’audit détaillée |
@@ -25,10 +28,14 @@ import sys
 import json
 import hashlib
 import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from urllib.parse import urlparse
 
 import pandas as pd
 import mysql.connector
+from mysql.connector import errorcode
 
 
 # ----------------------------
@@ -36,13 +43,39 @@ import mysql.connector
 # ----------------------------
 
 EXCEL_PATH = os.getenv("EXCEL_PATH", "data/MDR_questionnaire_V7_CORRIGE.xlsx")
+CSV_PATH = os.getenv("CSV_PATH", "")  # optional CSV export of the same sheet (same headers), read instead of EXCEL_PATH
 DEFAULT_REFERENTIAL_ID = int(os.getenv("DEFAULT_REFERENTIAL_ID", "1"))
 DEFAULT_ECONOMIC_ROLE = os.getenv("DEFAULT_ECONOMIC_ROLE", "all")  # ✅ your DB seems NOT NULL
 DRY_RUN = os.getenv("DRY_RUN", "0") == "1"
+BATCH_SIZE = max(1, int(os.getenv("BATCH_SIZE", "1000")))  # rows per executemany (multi-row INSERT)
+
+# LOAD DATA LOCAL INFILE refused by server/client -> fall back to batched INSERTs
+LOCAL_INFILE_REFUSED = {
+    errorcode.ER_NOT_ALLOWED_COMMAND,
+    errorcode.ER_CLIENT_LOCAL_FILES_DISABLED,
+    errorcode.CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+}
 
 PROCESS_TABLE = os.getenv("PROCESS_TABLE", "processus")
 QUESTIONS_TABLE = os.getenv("QUESTIONS_TABLE", "questions")
 
+# Excel headers
+COL_PROCESS = "Processus concerné"
+COL_CLAUSE = "Clause MDR"
+COL_INTITULE = "Intitulé"
+COL_QTEXT = "Question d’audit détaillée"
+COL_TYPE = "Type"
+COL_RISK = "Risque en cas de NC"
+COL_EVID = "Preuves attendues"
+COL_FUNCS = "Fonctions interrogées"
+COL_CRIT = "Criticité"
+
+# only these columns are read from the sheet (the others are never used)
+SHEET_COLUMNS = frozenset({
+    COL_PROCESS, COL_CLAUSE, COL_INTITULE, COL_QTEXT, COL_TYPE,
+    COL_RISK, COL_EVID, COL_FUNCS, COL_CRIT,
+})
+
 
 # ----------------------------
 # Utils
@@ -57,12 +90,19 @@ def die(msg: str, code: int = 1):
     sys.exit(code)
 
 
+_NBSP_TRANS = str.maketrans({"\u00a0": " "})
+_ENUM_VALUE_RE = re.compile(r"'([^']*)'")
+_LIST_SPLIT_RE = re.compile(r"[,\n;]+")
+_EMPTY_JSON_ARRAY = "[]"
+
+
 def norm_str(v):
-    if v is None:
+    if v is None or v == "":
+        return ""
+    if isinstance(v, float) and v != v:  # NaN (empty Excel cell)
         return ""
-    s = str(v).strip()
-    s = s.replace("\u00a0", " ").strip()
-    return s
+    s = v if type(v) is str else str(v)
+    return s.translate(_NBSP_TRANS).strip()
 
 
 def safe_json_array(v):
@@ -70,17 +110,25 @@ def safe_json_array(v):
     Convert "a, b, c" OR "['a','b']" OR '["a","b"]' into a JSON string array.
     """
     if v is None:
-        return json.dumps([])
+        return _EMPTY_JSON_ARRAY
     if isinstance(v, (list, tuple)):
         arr = [norm_str(x) for x in v if norm_str(x)]
         return json.dumps(arr, ensure_ascii=False)
 
     s = norm_str(v)
     if not s:
-        return json.dumps([])
+        return _EMPTY_JSON_ARRAY
+    return json_array_from_text(s)
 
-    # Try parse JSON
-    if (s.startswith("[") and s.endswith("]")) or (s.startswith("{") and s.endswith("}")):
+
+@lru_cache(maxsize=4096)
+def json_array_from_text(s: str) -> str:
+    """
+    safe_json_array for a normalized, non-empty text. Cached: the sheet has few distinct
+    texts (e.g. "Fonctions interrogées"), identical cells share one JSON string.
+    """
+    # Try parse JSON (only a list can be used; objects end up in the split below anyway)
+    if s[0] == "[" and s[-1] == "]":
         try:
             parsed = json.loads(s)
             if isinstance(parsed, list):
@@ -90,15 +138,38 @@ def safe_json_array(v):
             pass
 
     # Fallback split
-    parts = re.split(r"[,\n;]+", s)
+    parts = _LIST_SPLIT_RE.split(s)
     arr = [norm_str(p) for p in parts if norm_str(p)]
     return json.dumps(arr, ensure_ascii=False)
 
 
-def gen_question_key(article: str, process_name: str, question_text: str) -> str:
-    base = f"{norm_str(article)}|{norm_str(process_name)}|{norm_str(question_text)}"
-    h = hashlib.md5(base.encode("utf-8")).hexdigest()
-    return f"q_{h}"
+@lru_cache(maxsize=None)
+def json_array_single(value: str) -> str:
+    # the same dozen process names repeat over hundreds of rows -> serialize each once
+    return json.dumps([value], ensure_ascii=False)
+
+
+def gen_question_keys(articles, process_names, question_texts) -> list:
+    """
+    questionKey = q_ + md5("article|process|questionText") for whole columns
+    (values already normalized with norm_str).
+    """
+    # md5 must stay: audit responses are linked to questions through questionKey
+    return [
+        "q_" + hashlib.md5(f"{a}|{p}|{q}".encode("utf-8"), usedforsecurity=False).hexdigest()
+        for a, p, q in zip(articles, process_names, question_texts)
+    ]
+
+
+def read_excel(path: str, **kwargs):
+    """
+    calamine (Rust parser) is several times faster than openpyxl on large sheets;
+    openpyxl stays the fallback when python-calamine is not installed.
+    """
+    try:
+        return pd.read_excel(path, engine="calamine", **kwargs)
+    except ImportError:
+        return pd.read_excel(path, engine="openpyxl", **kwargs)
 
 
 def parse_database_url(url: str):
@@ -141,22 +212,75 @@ def get_mysql_config():
     die("❌ Missing DB connection env vars. Provide DB_HOST/DB_PORT/DB_USER/DB_PASSWORD/DB_NAME or DATABASE_URL.")
 
 
-def fetch_table_schema(cursor, table_name: str):
+def tsv_field(v) -> str:
+    if v is None:
+        return r"\N"
+    return str(v).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def load_data_local_infile(cursor, table: str, columns: list, rows: list, set_sql: str = "") -> bool:
+    """
+    Bulk-load rows through a temporary TSV file (\\N = NULL); set_sql holds the
+    SQL-expression columns (SET col = NOW(), ...). Returns False when LOCAL INFILE
+    is not allowed, so the caller can fall back to batched INSERTs.
+    LOCAL implies IGNORE (duplicate keys skipped, bad values truncated with a
+    warning only): any warning or missing row raises, like the INSERTs would.
     """
-    Returns:
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", newline="", delete=False) as f:
+        for row in rows:
+            f.write("\t".join(tsv_field(v) for v in row))
+            f.write("\n")
+        tsv_path = f.name
+
+    cols_sql = ", ".join([f"`{c}`" for c in columns])
+    sql = (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+        f"({cols_sql}){set_sql}"
+    )
+    try:
+        cursor.execute(sql, (tsv_path,))
+    except mysql.connector.Error as e:
+        if e.errno not in LOCAL_INFILE_REFUSED:
+            raise
+        log(f"⚠️ LOAD DATA LOCAL INFILE indisponible ({e.errno}), repli sur INSERT par lots")
+        return False
+    finally:
+        os.unlink(tsv_path)
+
+    loaded = cursor.rowcount
+    cursor.execute("SHOW WARNINGS")
+    warnings = [w for w in cursor.fetchall() if w[0] != "Note"]
+    if loaded != len(rows) or warnings:
+        details = "; ".join(f"{code} {msg}" for _, code, msg in warnings[:5])
+        raise RuntimeError(
+            f"LOAD DATA loaded {loaded}/{len(rows)} rows with {len(warnings)} warning(s): {details}"
+        )
+    return True
+
+
+def fetch_table_schemas(cursor, db_name: str, table_names: list):
+    """
+    Reads the columns of all tables in one information_schema round-trip.
+    Returns dict tableName -> (cols, types, nullables):
       - cols: list of column names
       - types: dict colName -> sqlType string (e.g., "varchar(50)", "enum('a','b')")
       - nullables: dict colName -> bool (True if NULL allowed)
     """
-    cursor.execute(f"SHOW COLUMNS FROM `{table_name}`")
-    cols = []
-    types = {}
-    nullables = {}
-    for field, col_type, is_null, key, default, extra in cursor.fetchall():
+    placeholders = ", ".join(["%s"] * len(table_names))
+    cursor.execute(
+        "SELECT TABLE_NAME, COLUMN_NAME, IS_NULLABLE, COLUMN_TYPE FROM information_schema.columns "
+        f"WHERE table_schema = %s AND table_name IN ({placeholders}) ORDER BY TABLE_NAME, ORDINAL_POSITION",
+        (db_name, *table_names),
+    )
+    schemas = {t: ([], {}, {}) for t in table_names}
+    requested = {t.lower(): t for t in table_names}  # information_schema may report another case
+    for table, field, is_null, col_type in cursor.fetchall():
+        cols, types, nullables = schemas[requested[str(table).lower()]]
         cols.append(field)
         types[field] = col_type
         nullables[field] = (str(is_null).upper() == "YES")
-    return cols, types, nullables
+    return schemas
 
 
 def pick_col(cols, *candidates):
@@ -178,7 +302,7 @@ def parse_enum_values(sql_type: str):
     inside = s[len("enum("):-1]  # remove enum( and trailing )
     # split by ',' while keeping quoted values
     # easiest: regex capture between single quotes
-    vals = re.findall(r"'([^']*)'", inside)
+    vals = _ENUM_VALUE_RE.findall(inside)
     return vals if vals else None
 
 
@@ -225,17 +349,51 @@ def normalize_to_enum(value_raw: str, allowed: list, fallback: str = None):
     return allowed[0]
 
 
+def enum_mapper(allowed: list):
+    """
+    normalize_to_enum memoized per raw value: Excel enum-like columns only
+    hold a handful of distinct labels, so the keyword scan runs once per label.
+    """
+    cache = {}
+
+    def mapper(value_raw: str):
+        mapped = cache.get(value_raw)
+        if mapped is None:
+            mapped = cache[value_raw] = normalize_to_enum(value_raw, allowed, fallback=allowed[0])
+        return mapped
+
+    return mapper
+
+
 # ----------------------------
 # Main
 # ----------------------------
 
-def main():
-    log("📥 Lecture Excel...")
-    if not os.path.exists(EXCEL_PATH):
-        die(f"❌ Excel file not found: {EXCEL_PATH}")
+def load_sheet():
+    if CSV_PATH:
+        # every cell as text, empty cells as "" (no NaN inference / fillna needed)
+        return pd.read_csv(
+            CSV_PATH, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+            usecols=lambda c: c in SHEET_COLUMNS,
+        )
+    # empty cells stay NaN (no fillna copy of the frame): norm_str maps them to ""
+    return read_excel(EXCEL_PATH, usecols=lambda c: c in SHEET_COLUMNS)
 
-    df = pd.read_excel(EXCEL_PATH, engine="openpyxl").fillna("")
-    log(f"📊 Lignes détectées: {len(df)}")
+
+def main():
+    if CSV_PATH:
+        log("📥 Lecture CSV...")
+        if not os.path.exists(CSV_PATH):
+            die(f"❌ CSV file not found: {CSV_PATH}")
+    else:
+        log("📥 Lecture Excel...")
+        if not os.path.exists(EXCEL_PATH):
+            die(f"❌ Excel file not found: {EXCEL_PATH}")
+
+    # Parse the sheet in a worker thread while the main thread connects and introspects the DB
+    pool = ThreadPoolExecutor(max_workers=1)
+    sheet_future = pool.submit(load_sheet)
+    pool.shutdown(wait=False)
 
     cfg = get_mysql_config()
     log(f"🔌 Connexion MySQL -> host={cfg['host']} port={cfg['port']} db={cfg['database']} user={cfg['user']}")
@@ -248,12 +406,14 @@ def main():
         database=cfg["database"],
         connection_timeout=30,
         autocommit=False,
+        allow_local_infile=True,
     )
     cursor = conn.cursor()
 
     # Introspect schema
-    process_cols, process_types, process_nullables = fetch_table_schema(cursor, PROCESS_TABLE)
-    questions_cols, questions_types, questions_nullables = fetch_table_schema(cursor, QUESTIONS_TABLE)
+    schemas = fetch_table_schemas(cursor, cfg["database"], [PROCESS_TABLE, QUESTIONS_TABLE])
+    process_cols, process_types, process_nullables = schemas[PROCESS_TABLE]
+    questions_cols, questions_types, questions_nullables = schemas[QUESTIONS_TABLE]
 
     log(f"🧭 Colonnes table processus: {process_cols}")
     log(f"🧾 Colonnes table questions: {questions_cols}")
@@ -275,21 +435,29 @@ def main():
             continue
         process_map[norm_str(pname).lower()] = int(pid)
 
-    def get_or_create_process_id(process_name: str) -> int:
-        pname = norm_str(process_name) or "Non défini"
-        key = pname.lower()
-        if key in process_map:
-            return process_map[key]
+    def create_missing_processes(names):
+        """
+        Create every process not yet in process_map with one multi-row INSERT
+        (first spelling wins), then read their ids back in one SELECT.
+        """
+        missing = {}
+        for name in names:
+            pname = norm_str(name) or "Non défini"
+            key = pname.lower()
+            if key not in process_map and key not in missing:
+                missing[key] = pname
+        if not missing:
+            return
 
         if DRY_RUN:
-            fake_id = max(process_map.values(), default=0) + 1
-            process_map[key] = fake_id
-            log(f"🧪 DRY_RUN: Processus créé: '{pname}' -> id={fake_id}")
-            return fake_id
+            for key, pname in missing.items():
+                fake_id = max(process_map.values(), default=0) + 1
+                process_map[key] = fake_id
+                log(f"🧪 DRY_RUN: Processus créé: '{pname}' -> id={fake_id}")
+            return
 
         cols = [process_name_col]
         placeholders = ["%s"]
-        params = [pname]
 
         if process_created_col in process_cols:
             # Some schemas use defaultNow; but NOW() is safe too
@@ -297,11 +465,17 @@ def main():
             placeholders.append("NOW()")
 
         insert_sql = f"INSERT INTO `{PROCESS_TABLE}` ({', '.join([f'`{c}`' for c in cols])}) VALUES ({', '.join(placeholders)})"
-        cursor.execute(insert_sql, tuple(params))
-        new_id = cursor.lastrowid
-        process_map[key] = int(new_id)
-        log(f"➕ Processus créé: '{pname}' -> id={new_id}")
-        return int(new_id)
+        cursor.executemany(insert_sql, [(pname,) for pname in missing.values()])
+
+        in_sql = ", ".join(["%s"] * len(missing))
+        cursor.execute(
+            f"SELECT `{process_id_col}`, `{process_name_col}` FROM `{PROCESS_TABLE}` WHERE `{process_name_col}` IN ({in_sql})",
+            tuple(missing.values()),
+        )
+        for pid, pname in cursor.fetchall():
+            process_map[norm_str(pname).lower()] = int(pid)
+        for key, pname in missing.items():
+            log(f"➕ Processus créé: '{pname}' -> id={process_map[key]}")
 
     # Detect ENUM allowed values for criticality & questionType (and any other if needed)
     criticality_enum = parse_enum_values(questions_types.get("criticality", ""))
@@ -312,22 +486,38 @@ def main():
     if questiontype_enum:
         log(f"🧩 questionType ENUM détecté: {questiontype_enum}")
 
+    df = sheet_future.result()
+    log(f"📊 Lignes détectées: {len(df)}")
+
     # Full replace
     log("🧹 Suppression anciennes questions...")
     if not DRY_RUN:
         cursor.execute(f"DELETE FROM `{QUESTIONS_TABLE}`")
 
-    # Excel headers
-    COL_PROCESS = "Processus concerné"
-    COL_OBJECTIF = "Objectif du processus"
-    COL_CLAUSE = "Clause MDR"
-    COL_INTITULE = "Intitulé"
-    COL_QTEXT = "Question d’audit détaillée"
-    COL_TYPE = "Type"
-    COL_RISK = "Risque en cas de NC"
-    COL_EVID = "Preuves attendues"
-    COL_FUNCS = "Fonctions interrogées"
-    COL_CRIT = "Criticité"
+    # Column-wise pre-pass: normalize every Excel column used by the INSERT once, for the
+    # rows that will be imported (non-empty question); values are plain Python lists aligned
+    # with those rows, the INSERT tuples are then just zipped from the columns.
+    no_values = pd.Series("", index=df.index)
+    qtext_col = df.get(COL_QTEXT, no_values).map(norm_str)
+    has_question = qtext_col != ""
+    imported = df[has_question]
+
+    normalized_cols = {}
+
+    def text_col(header: str) -> list:
+        # each column is normalized once, even when several INSERT columns read it (risk/risks)
+        if header not in normalized_cols:
+            normalized_cols[header] = imported.get(header, no_values[has_question]).map(norm_str).tolist()
+        return normalized_cols[header]
+
+    qtexts = qtext_col[has_question].tolist()
+    processes = [p or "Non défini" for p in text_col(COL_PROCESS)]
+    clauses = text_col(COL_CLAUSE)
+    row_index = imported.index.tolist()
+
+    if "processId" in questions_cols:
+        # only rows that will be imported may create a process
+        create_missing_processes(processes)
 
     # Build insert dynamically
     insert_cols = []
@@ -335,79 +525,79 @@ def main():
     extractors = []
 
     def add_col(db_col: str, placeholder: str, extractor):
+        # extractor: () -> list of values, one per imported row
         insert_cols.append(db_col)
         insert_placeholders.append(placeholder)
         extractors.append(extractor)
 
+    # constants (same for every row) are inlined as SQL literals: no per-row bind
     if "referentialId" in questions_cols:
-        add_col("referentialId", "%s", lambda r: DEFAULT_REFERENTIAL_ID)
+        add_col("referentialId", str(int(DEFAULT_REFERENTIAL_ID)), None)
 
     if "processId" in questions_cols:
-        add_col("processId", "%s", lambda r: get_or_create_process_id(r.get(COL_PROCESS, "")))
+        add_col("processId", "%s", lambda: [process_map[p.lower()] for p in processes])
 
     if "questionKey" in questions_cols:
-        def _qkey(r):
-            key = gen_question_key(r.get(COL_CLAUSE, ""), r.get(COL_PROCESS, ""), r.get(COL_QTEXT, ""))
-            return key[:255]
-        add_col("questionKey", "%s", _qkey)
+        add_col("questionKey", "%s", lambda: [k[:255] for k in gen_question_keys(clauses, processes, qtexts)])
 
     if "article" in questions_cols:
-        add_col("article", "%s", lambda r: (norm_str(r.get(COL_CLAUSE, ""))[:255] or None))
+        add_col("article", "%s", lambda: [c[:255] or None for c in clauses])
 
     if "title" in questions_cols:
-        add_col("title", "%s", lambda r: (norm_str(r.get(COL_INTITULE, ""))[:255] or None))
+        add_col("title", "%s", lambda: [t[:255] or None for t in text_col(COL_INTITULE)])
 
     if "questionText" in questions_cols:
-        add_col("questionText", "%s", lambda r: (norm_str(r.get(COL_QTEXT, "")) or None))
+        add_col("questionText", "%s", lambda: qtexts)
 
     if "questionType" in questions_cols:
-        def _qtype(r):
-            raw = norm_str(r.get(COL_TYPE, ""))
-            if questiontype_enum:
-                return normalize_to_enum(raw, questiontype_enum, fallback=questiontype_enum[0])
+        map_qtype = enum_mapper(questiontype_enum) if questiontype_enum else None
+
+        def _qtype():
+            raws = text_col(COL_TYPE)
+            if map_qtype:
+                return [map_qtype(raw) for raw in raws]
             # fallback varchar
-            return raw[:50] if raw else None
+            return [raw[:50] if raw else None for raw in raws]
         add_col("questionType", "%s", _qtype)
 
     if "expectedEvidence" in questions_cols:
-        add_col("expectedEvidence", "%s", lambda r: (norm_str(r.get(COL_EVID, "")) or None))
+        add_col("expectedEvidence", "%s", lambda: [e or None for e in text_col(COL_EVID)])
 
     if "criticality" in questions_cols:
-        def _crit(r):
-            raw = norm_str(r.get(COL_CRIT, ""))
-            if criticality_enum:
-                return normalize_to_enum(raw, criticality_enum, fallback=criticality_enum[0])
+        map_crit = enum_mapper(criticality_enum) if criticality_enum else None
+
+        def _crit():
+            raws = text_col(COL_CRIT)
+            if map_crit:
+                return [map_crit(raw) for raw in raws]
             # fallback varchar(50)
-            return raw[:50] if raw else None
+            return [raw[:50] if raw else None for raw in raws]
         add_col("criticality", "%s", _crit)
 
-    excel_risk_extractor = lambda r: (norm_str(r.get(COL_RISK, "")) or None)
+    excel_risk_extractor = lambda: [r or None for r in text_col(COL_RISK)]
     if "risk" in questions_cols:
         add_col("risk", "%s", excel_risk_extractor)
     if "risks" in questions_cols:
         add_col("risks", "%s", excel_risk_extractor)
 
     if "interviewFunctions" in questions_cols:
-        add_col("interviewFunctions", "%s", lambda r: safe_json_array(r.get(COL_FUNCS, "")))
+        add_col("interviewFunctions", "%s", lambda: [safe_json_array(f) for f in text_col(COL_FUNCS)])
 
     if "applicableProcesses" in questions_cols:
-        add_col("applicableProcesses", "%s", lambda r: json.dumps([norm_str(r.get(COL_PROCESS, "")) or "Non défini"], ensure_ascii=False))
+        add_col("applicableProcesses", "%s", lambda: [json_array_single(p) for p in processes])
 
     # economicRole (NOT NULL on your DB => must always be set)
+    # (you can later improve this by reading from Excel if you add a column)
     if "economicRole" in questions_cols:
-        def _role(_r):
-            # you can later improve this by reading from Excel if you add a column
-            return DEFAULT_ECONOMIC_ROLE
-        add_col("economicRole", "%s", _role)
+        # bound like any other value (TSV field / %s), never inlined in the SQL
+        add_col("economicRole", "%s", lambda: [DEFAULT_ECONOMIC_ROLE] * len(row_index))
 
     if "displayOrder" in questions_cols:
-        add_col("displayOrder", "%s", lambda r: int(r.get("__row_index__", 0)) + 1)
+        add_col("displayOrder", "%s", lambda: [idx + 1 for idx in row_index])
 
     # createdAt: safe set NOW()
     if "createdAt" in questions_cols:
-        insert_cols.append("createdAt")
-        insert_placeholders.append("NOW()")
-        extractors.append(lambda r: None)
+        add_col("createdAt", "NOW()", None)
 
     if not insert_cols:
         die("❌ No compatible columns found to insert into questions table.")
@@ -417,45 +607,59 @@ def main():
     insert_sql = f"INSERT INTO `{QUESTIONS_TABLE}` ({cols_sql}) VALUES ({placeholders_sql})"
     log("🧾 SQL INSERT questions prêt.")
 
-    inserted = 0
-    skipped = 0
-
-    for idx, row in df.iterrows():
-        r = {k: row[k] for k in df.columns}
-        r["__row_index__"] = idx
-
-        qtext = norm_str(r.get(COL_QTEXT, ""))
-        if not qtext:
-            skipped += 1
-            continue
-
-        if not norm_str(r.get(COL_PROCESS, "")):
-            r[COL_PROCESS] = "Non défini"
+    # extractors bound to a %s placeholder, in INSERT order (SQL literals like NOW() take no param)
+    param_extractors = [ex for ph, ex in zip(insert_placeholders, extractors) if ph == "%s"]
+    param_cols = [c for c, ph in zip(insert_cols, insert_placeholders) if ph == "%s"]
+    literal_sets = [f"`{c}` = {ph}" for c, ph in zip(insert_cols, insert_placeholders) if ph != "%s"]
+    load_set_sql = f" SET {', '.join(literal_sets)}" if literal_sets else ""
 
-        params = []
-        for col, ph, ex in zip(insert_cols, insert_placeholders, extractors):
-            if ph.strip().upper() == "NOW()":
-                continue
-            params.append(ex(r))
-
-        if DRY_RUN:
-            inserted += 1
-            continue
+    inserted = len(qtexts)
+    skipped = len(df) - inserted
+    all_params = []
+    excel_rows = [idx + 2 for idx in row_index]  # Excel row number of each entry of all_params (for error messages)
 
+    def insert_batch(start: int):
+        batch = all_params[start:start + BATCH_SIZE]
         try:
-            cursor.execute(insert_sql, tuple(params))
-            inserted += 1
+            # mysql-connector rewrites executemany INSERTs into one multi-row INSERT
+            cursor.executemany(insert_sql, batch)
         except Exception as e:
-            log(f"❌ Insert failed at Excel row={idx+2} (1-based with header). Error: {e}")
-            log(f"   Process='{norm_str(r.get(COL_PROCESS,''))}' Clause='{norm_str(r.get(COL_CLAUSE,''))}'")
-            log(f"   Criticité Excel='{norm_str(r.get(COL_CRIT,''))}' -> mapped='{_crit(r) if 'criticality' in questions_cols else None}'")
-            log(f"   Question='{qtext[:200]}'")
+            log(
+                f"❌ Insert failed for Excel rows {excel_rows[start]}-{excel_rows[start + len(batch) - 1]} "
+                f"(1-based with header). Error: {e}"
+            )
             conn.rollback()
             raise
+        # no intermediate commit: DELETE + all batches form one transaction (single commit below)
+        log(f"✅ {start + len(batch)} questions importées...")
 
-        if inserted % 200 == 0:
-            conn.commit()
-            log(f"✅ {inserted} questions importées...")
+    if not DRY_RUN:
+        # one list per INSERT column, zipped into the row tuples
+        all_params = list(zip(*[ex() for ex in param_extractors]))
+
+    if not DRY_RUN and all_params:
+        # processIds were all resolved/created above: skip per-row FK checks during the bulk load
+        # (after the DELETE, so that one still sees the FKs). unique_checks stays on: questionKey
+        # is UNIQUE and duplicates must not slip into the index; DISABLE KEYS is a no-op on InnoDB.
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        try:
+            try:
+                loaded = load_data_local_infile(cursor, QUESTIONS_TABLE, param_cols, all_params, load_set_sql)
+            except Exception as e:
+                log(f"❌ LOAD DATA failed. Error: {e}")
+                conn.rollback()
+                raise
+            if loaded:
+                log(f"✅ {len(all_params)} questions chargées (LOAD DATA LOCAL INFILE)")
+            else:
+                for start in range(0, len(all_params), BATCH_SIZE):
+                    insert_batch(start)
+        finally:
+            # a failed reset (e.g. lost connection) must not mask the import error
+            try:
+                cursor.execute("SET SESSION foreign_key_checks = 1")
+            except mysql.connector.Error as e:
+                log(f"⚠️ Impossible de rétablir foreign_key_checks: {e}")
 
     if not DRY_RUN:
         conn.commit()
@@ -25,6 +25,17 @@ from typing import Any, Dict, Optional, Tuple, List
 import mysql.connector
 import pandas as pd
 
+# the sheet is parsed by the importer's reader, so cells (and questionKeys) match the import
+from import_iso_questions_from_excel import build_sheet
+
+
+BATCH_SIZE = 1000  # rows per multi-row INSERT into the temporary table
+
+_WS_RE = re.compile(r"\s+")
+_HEADER_CHARS = str.maketrans(
+    {"’": "'", "`": "'", "é": "e", "è": "e", "ê": "e", "à": "a", "ù": "u", "î": "i", "ï": "i"}
+)
+
 
 def getenv_str(name: str, default: str = "") -> str:
     v = os.getenv(name)
@@ -45,41 +56,35 @@ def getenv_int(name: str, default: int) -> int:
 
 
 def normalize_header(value: str) -> str:
-    value = (value or "").strip().lower()
-    value = (
-        value.replace("’", "'")
-        .replace("`", "'")
-        .replace("é", "e")
-        .replace("è", "e")
-        .replace("ê", "e")
-        .replace("à", "a")
-        .replace("ù", "u")
-        .replace("î", "i")
-        .replace("ï", "i")
-    )
-    value = re.sub(r"\s+", " ", value)
-    return value
+    value = (value or "").strip().lower().translate(_HEADER_CHARS)
+    return _WS_RE.sub(" ", value)
 
 
 def str_or_none(v: Any) -> Optional[str]:
     if v is None:
         return None
-    if isinstance(v, float) and pd.isna(v):
+    if isinstance(v, float) and v != v:  # NaN (empty cell)
         return None
     s = str(v).strip()
     return s if s else None
 
 
-def resolve_sheet_value(row: pd.Series, aliases: List[str]) -> Optional[str]:
-    normalized = {normalize_header(str(col)): col for col in row.index}
+def build_header_index(columns) -> Dict[str, int]:
+    return {normalize_header(str(col)): i for i, col in enumerate(columns)}
+
+
+def resolve_column(header_index: Dict[str, int], aliases: List[str]) -> Optional[int]:
     for alias in aliases:
-        key = normalize_header(alias)
-        col = normalized.get(key)
-        if col is not None:
-            return str_or_none(row.get(col))
+        i = header_index.get(normalize_header(alias))
+        if i is not None:
+            return i
     return None
 
 
+def cell(values: tuple, index: Optional[int]) -> Optional[str]:
+    return str_or_none(values[index]) if index is not None else None
+
+
 def get_required_env() -> Tuple[str, int, bool, Dict[str, Any]]:
     excel_path = getenv_str("EXCEL_PATH", "")
     referential_id = getenv_int("DEFAULT_REFERENTIAL_ID", 2)
@@ -100,13 +105,20 @@ def get_required_env() -> Tuple[str, int, bool, Dict[str, Any]]:
     return excel_path, referential_id, dry_run, db_config
 
 
-def build_sheet(path: str) -> pd.DataFrame:
-    # identical to importer (header=2)
-    return pd.read_excel(path, header=2)
+def needed_process_names(sheet: pd.DataFrame, i_process: Optional[int]) -> List[str]:
+    """Distinct process names of the sheet, lower-cased like the process_map lookups."""
+    if i_process is None:
+        return []
+    names = {str_or_none(v) for v in sheet.iloc[:, i_process]}
+    return sorted(n.lower() for n in names if n)
 
 
-def load_process_map(cur) -> Dict[str, int]:
-    cur.execute("SELECT id, name FROM processus")
+def load_process_map(cur, names: List[str]) -> Dict[str, int]:
+    # only the processes referenced by the sheet, not the whole table
+    if not names:
+        return {}
+    placeholders = ", ".join(["%s"] * len(names))
+    cur.execute(f"SELECT id, name FROM processus WHERE LOWER(TRIM(name)) IN ({placeholders})", tuple(names))
     rows = cur.fetchall()
     mp: Dict[str, int] = {}
     for r in rows:
@@ -149,6 +161,63 @@ def detect_question_columns(cur, db_name: str) -> Dict[str, str]:
     return {k: v for k, v in mapping.items() if v}
 
 
+def key_column_type(cur, db_name: str, key_col: str) -> str:
+    """
+    Staging type for questionKey with the charset/collation of questions.questionKey,
+    so the UPDATE ... JOIN compares both sides in the same collation (no ERROR 1267).
+    """
+    cur.execute(
+        """
+        SELECT CHARACTER_SET_NAME AS charset, COLLATION_NAME AS collation
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA=%s AND TABLE_NAME='questions' AND COLUMN_NAME=%s
+        """,
+        (db_name, key_col),
+    )
+    row = cur.fetchone()
+    if row and row["charset"] and row["collation"]:
+        return f"VARCHAR(255) CHARACTER SET {row['charset']} COLLATE {row['collation']}"
+    return "VARCHAR(255)"
+
+
+def apply_patch(
+    cur,
+    q_cols: Dict[str, str],
+    key_type: str,
+    patch_cols: List[str],
+    referential_id: int,
+    values_by_key: Dict[str, List[Any]],
+) -> set:
+    """
+    Stage (questionKey, new values) in a temporary table, then patch every matching
+    question with one UPDATE ... JOIN. Returns the staged keys found in the referential.
+    """
+    cols_sql = ", ".join(f"`{c}`" for c in patch_cols)
+    col_defs = ", ".join(f"`{c}` LONGTEXT NULL" for c in patch_cols)
+    cur.execute(f"CREATE TEMPORARY TABLE patch_values (questionKey {key_type} NOT NULL PRIMARY KEY, {col_defs})")
+    try:
+        placeholders = ", ".join(["%s"] * (len(patch_cols) + 1))
+        insert_sql = f"INSERT INTO patch_values (questionKey, {cols_sql}) VALUES ({placeholders})"
+        rows = [(key, *vals) for key, vals in values_by_key.items()]
+        for start in range(0, len(rows), BATCH_SIZE):
+            # mysql-connector rewrites executemany INSERTs into one multi-row INSERT
+            cur.executemany(insert_sql, rows[start:start + BATCH_SIZE])
+
+        join_sql = (
+            f"questions q JOIN patch_values p ON q.`{q_cols['questionKey']}` = p.questionKey "
+            f"AND q.`{q_cols['referentialId']}` = %s"
+        )
+        # matched keys come from the join (rowcount would skip rows whose values are already up to date)
+        cur.execute(f"SELECT p.questionKey AS question_key FROM {join_sql}", (referential_id,))
+        matched = {r["question_key"] for r in cur.fetchall()}
+
+        sets = ", ".join(f"q.`{c}` = p.`{c}`" for c in patch_cols)
+        cur.execute(f"UPDATE {join_sql} SET {sets}", (referential_id,))
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS patch_values")
+    return matched
+
+
 def main() -> None:
     excel_path, referential_id, dry_run, db_config = get_required_env()
 
@@ -164,38 +233,37 @@ def main() -> None:
     cur = conn.cursor(dictionary=True)
 
     q_cols = detect_question_columns(cur, db_config["database"])
-    process_map = load_process_map(cur)
 
     updated = 0
     skipped = 0
     missing_process = 0
     not_found = 0
 
-    # Prepared statement
-    set_parts = []
-    if q_cols.get("risk"):
-        set_parts.append(f"`{q_cols['risk']}` = %s")
-    if q_cols.get("risks"):
-        set_parts.append(f"`{q_cols['risks']}` = %s")
-    if q_cols.get("expectedEvidence"):
-        set_parts.append(f"`{q_cols['expectedEvidence']}` = %s")
-
-    if not set_parts:
+    # patched columns, in the order of the params built below
+    patch_cols = [q_cols[k] for k in ("risk", "risks", "expectedEvidence") if q_cols.get(k)]
+    if not patch_cols:
         raise SystemExit("Neither risk/risks/expectedEvidence columns exist to patch.")
 
-    sql_update = f"""
-      UPDATE questions
-      SET {", ".join(set_parts)}
-      WHERE `{q_cols['questionKey']}` = %s AND `{q_cols['referentialId']}` = %s
-    """
+    # resolve Excel columns once (positions in the itertuples rows)
+    header_index = build_header_index(sheet.columns)
+    i_process = resolve_column(header_index, ["Processus concerné", "Processus concerne"])
+    i_article = resolve_column(header_index, ["Clause"])
+    i_question = resolve_column(
+        header_index,
+        ["Question d’audit détaillée", "Question d'audit détaillée", "Question d audit detaillee"],
+    )
+    i_risk = resolve_column(header_index, ["Risque", "Risques"])
+    i_expected = resolve_column(header_index, ["Preuves attendues"])
 
-    for _, row in sheet.iterrows():
-        process_name = resolve_sheet_value(row, ["Processus concerné", "Processus concerne"])
-        article = resolve_sheet_value(row, ["Clause"]) or "N/A"
-        question_text = resolve_sheet_value(
-            row,
-            ["Question d’audit détaillée", "Question d'audit détaillée", "Question d audit detaillee"],
-        )
+    process_map = load_process_map(cur, needed_process_names(sheet, i_process))
+
+    key_raws: List[str] = []
+    set_params: List[List[Any]] = []
+
+    for values in sheet.itertuples(index=False, name=None):
+        process_name = cell(values, i_process)
+        article = cell(values, i_article) or "N/A"
+        question_text = cell(values, i_question)
 
         if not process_name or not question_text:
             skipped += 1
@@ -207,14 +275,10 @@ def main() -> None:
             continue
 
         # Values to patch
-        risk = resolve_sheet_value(row, ["Risque", "Risques"])
-        expected = resolve_sheet_value(row, ["Preuves attendues"])
+        risk = cell(values, i_risk)
+        expected = cell(values, i_expected)
 
-        # Recompute questionKey EXACTLY like importer
-        key_raw = f"{referential_id}|{article}|{pid}|{question_text}"
-        question_key = "q_" + hashlib.md5(key_raw.encode("utf-8")).hexdigest()
-
-        # Build params in same order as set_parts
+        # Build params in same order as patch_cols
         params: List[Any] = []
         if q_cols.get("risk"):
             params.append(risk)
@@ -224,19 +288,21 @@ def main() -> None:
         if q_cols.get("expectedEvidence"):
             params.append(expected)
 
-        # WHERE params
-        params.append(question_key)
-        params.append(referential_id)
-
-        if dry_run:
-            updated += 1
-            continue
-
-        cur.execute(sql_update, tuple(params))
-        if cur.rowcount == 0:
-            not_found += 1
-        else:
-            updated += 1
+        key_raws.append(f"{referential_id}|{article}|{pid}|{question_text}")
+        set_params.append(params)
+
+    # Recompute questionKey EXACTLY like importer, for all lines at once
+    question_keys = ["q_" + hashlib.md5(k.encode("utf-8")).hexdigest() for k in key_raws]
+
+    if dry_run:
+        updated = len(question_keys)
+    elif question_keys:
+        # a later Excel line with the same key wins, as with the former row-by-row UPDATEs
+        values_by_key = dict(zip(question_keys, set_params))
+        key_type = key_column_type(cur, db_config["database"], q_cols["questionKey"])
+        matched = apply_patch(cur, q_cols, key_type, patch_cols, referential_id, values_by_key)
+        updated = sum(1 for key in question_keys if key in matched)
+        not_found = len(question_keys) - updated
 
     if not dry_run:
         conn.commit()
@@ -6,6 +6,10 @@ V2 strategy:
 1) Prefer UPDATE by (referentialId + code) if Excel provides "code"
 2) Fallback UPDATE by (referentialId + processId + article + normalized questionText)
 
+The Excel lines are staged in a temporary table and matched with two SELECT ... JOIN
+(same column collations as the former per-line WHERE); the new values are staged in
+a second temporary table and applied with a single UPDATE ... JOIN.
+
 Fixes in this version:
 - Railway/MySQL proxy often requires SSL: enable SSL (rejectUnauthorized=False equivalent)
 - Add connect retry/backoff + timeouts to avoid transient handshake failures
@@ -13,14 +17,35 @@ Fixes in this version:
 
 from __future__ import annotations
 
+import json
 import os
 import re
 import time
-from typing import Any, Dict, Optional, List
+from functools import lru_cache
+from typing import Any, Dict, Optional, List, Tuple
 
 import pandas as pd
 import mysql.connector
 
+# the sheet is parsed by the importer's reader, so cells (and questionKeys) match the import
+from import_iso_questions_from_excel import build_sheet
+
+
+BATCH_SIZE = 1000  # rows per multi-row INSERT into the temporary tables
+
+_WS_RE = re.compile(r"\s+")
+_HEADER_CHARS = str.maketrans(
+    {"’": "'", "`": "'", "é": "e", "è": "e", "ê": "e", "à": "a", "ù": "u", "î": "i", "ï": "i"}
+)
+
+# Excel header aliases of the columns the patch reads (every other column is dropped at load)
+PROCESS_ALIASES = ["Processus concerné", "Processus concerne"]
+ARTICLE_ALIASES = ["Clause"]
+QUESTION_ALIASES = ["Question d’audit détaillée", "Question d'audit détaillée"]
+CODE_ALIASES = ["code", "Code", "CODE"]
+RISK_ALIASES = ["Risque", "Risques"]
+EXPECTED_ALIASES = ["Preuves attendues"]
+
 
 def getenv_str(name: str, default: str = "") -> str:
     v = os.getenv(name)
@@ -41,61 +66,61 @@ def getenv_int(name: str, default: int) -> int:
 
 
 def normalize_header(value: str) -> str:
-    value = (value or "").strip().lower()
-    value = (
-        value.replace("’", "'")
-        .replace("`", "'")
-        .replace("é", "e")
-        .replace("è", "e")
-        .replace("ê", "e")
-        .replace("à", "a")
-        .replace("ù", "u")
-        .replace("î", "i")
-        .replace("ï", "i")
-    )
-    value = re.sub(r"\s+", " ", value)
-    return value
+    value = (value or "").strip().lower().translate(_HEADER_CHARS)
+    return _WS_RE.sub(" ", value)
 
 
 def str_or_none(v: Any) -> Optional[str]:
     if v is None:
         return None
-    if isinstance(v, float) and pd.isna(v):
+    if isinstance(v, float) and v != v:  # NaN (empty cell)
         return None
     s = str(v).strip()
     return s if s else None
 
 
-def get_cell(row: pd.Series, aliases: List[str]) -> Optional[str]:
-    normalized = {normalize_header(str(col)): col for col in row.index}
+def build_header_index(columns) -> Dict[str, int]:
+    return {normalize_header(str(col)): i for i, col in enumerate(columns)}
+
+
+def resolve_column(header_index: Dict[str, int], aliases: List[str]) -> Optional[int]:
     for alias in aliases:
-        key = normalize_header(alias)
-        col = normalized.get(key)
-        if col is not None:
-            return str_or_none(row.get(col))
+        i = header_index.get(normalize_header(alias))
+        if i is not None:
+            return i
     return None
 
 
+def get_column(sheet: pd.DataFrame, index: Optional[int]) -> List[Optional[str]]:
+    """Cleaned values of one sheet column (all None when the column is missing)."""
+    if index is None:
+        return [None] * len(sheet)
+    return [str_or_none(v) for v in sheet.iloc[:, index].tolist()]
+
+
 def normalize_question_text(s: str) -> str:
     s = (s or "").strip()
-    s = re.sub(r"\s+", " ", s)
+    s = _WS_RE.sub(" ", s)
     s = s.replace("’", "'").replace("`", "'")
     return s
 
 
-def build_sheet(path: str) -> pd.DataFrame:
-    return pd.read_excel(path, header=2)
+def needed_process_names(processes: List[Optional[str]]) -> List[str]:
+    """Distinct process names of the sheet, lower-cased like the process_map lookups."""
+    return sorted({n.lower() for n in processes if n})
 
 
-def load_process_map(cur) -> Dict[str, int]:
-    cur.execute("SELECT id, name FROM processus")
-    rows = cur.fetchall()
+def load_process_map(cur, names: List[str]) -> Dict[str, int]:
+    # only the processes referenced by the sheet, not the whole table
+    if not names:
+        return {}
+    placeholders = ", ".join(["%s"] * len(names))
+    cur.execute(f"SELECT id, name FROM processus WHERE LOWER(TRIM(name)) IN ({placeholders})", tuple(names))
     mp: Dict[str, int] = {}
-    for r in rows:
-        name = (r.get("name") or "").strip().lower()
-        pid = int(r["id"])
+    for pid, name in cur.fetchall():
+        name = (name or "").strip().lower()
         if name:
-            mp[name] = pid
+            mp[name] = int(pid)
     return mp
 
 
@@ -108,7 +133,7 @@ def detect_cols(cur, db_name: str) -> Dict[str, str]:
         """,
         (db_name,),
     )
-    cols = {str(r["column_name"]) for r in cur.fetchall()}
+    cols = {str(name) for (name,) in cur.fetchall()}
 
     def first_existing(cands: List[str]) -> Optional[str]:
         for c in cands:
@@ -135,10 +160,152 @@ def detect_cols(cur, db_name: str) -> Dict[str, str]:
     return {k: v for k, v in mapping.items() if v}
 
 
+def match_column_types(cur, db_name: str, q_cols: Dict[str, str]) -> Dict[str, str]:
+    """
+    Staging column type per matched text column (code/article/questionText), with the
+    charset and collation of the questions column: the join then compares values
+    exactly like the former per-line WHERE did (case/accents/trailing spaces).
+    """
+    names = [q_cols[k] for k in ("code", "article", "questionText") if q_cols.get(k)]
+    types = {name: "LONGTEXT" for name in names}
+    if not names:
+        return types
+    placeholders = ", ".join(["%s"] * len(names))
+    cur.execute(
+        f"""
+        SELECT COLUMN_NAME, CHARACTER_SET_NAME, COLLATION_NAME
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA=%s AND TABLE_NAME='questions' AND COLUMN_NAME IN ({placeholders})
+        """,
+        (db_name, *names),
+    )
+    for name, charset, collation in cur.fetchall():
+        if charset and collation:
+            types[str(name)] = f"LONGTEXT CHARACTER SET {charset} COLLATE {collation}"
+    return types
+
+
+def warn_missing_indexes(cur, q_cols: Dict[str, str]) -> None:
+    """
+    match_lines joins questions on code and on (processId, article, questionText):
+    without an index starting with those columns (optionally after referentialId)
+    each join scans the whole table. Only warns, schema changes go through migrations.
+    """
+    cur.execute("SHOW INDEX FROM questions")
+    indexes: Dict[str, List[Tuple[int, str]]] = {}
+    for row in cur.fetchall():
+        # Table, Non_unique, Key_name, Seq_in_index, Column_name, ...
+        indexes.setdefault(str(row[2]), []).append((int(row[3]), str(row[4])))
+    leading = []
+    for cols in indexes.values():
+        names = [name for _, name in sorted(cols)]
+        if names[0] == q_cols["referentialId"]:
+            names = names[1:]
+        if names:
+            leading.append(names[0])
+
+    ref = q_cols["referentialId"]
+    if q_cols.get("code") and q_cols["code"] not in leading:
+        print(
+            f"[WARN] no index on questions.{q_cols['code']}: matching by code scans the table. "
+            f"Suggested: CREATE INDEX idx_questions_ref_code ON questions ({ref}, {q_cols['code']});"
+        )
+    if q_cols.get("processId") and q_cols.get("article") and q_cols.get("questionText"):
+        if q_cols["processId"] not in leading:
+            print(
+                f"[WARN] no index on questions.{q_cols['processId']}: fallback matching scans the table. "
+                f"Suggested: CREATE INDEX idx_questions_ref_pid_art_qt ON questions "
+                f"({ref}, {q_cols['processId']}, {q_cols['article']}, {q_cols['questionText']}(255));"
+            )
+
+
+def match_lines(
+    cur,
+    q_cols: Dict[str, str],
+    col_types: Dict[str, str],
+    referential_id: int,
+    lines: List[Tuple[Optional[str], int, str, str]],
+) -> Tuple[Dict[int, List[int]], Dict[int, int]]:
+    """
+    Match the Excel lines (code, processId, article, questionText) in SQL, through a
+    temporary table joined with questions, instead of one UPDATE probe per line.
+    Returns (line -> ids with that code, line -> first id of the fallback columns); the
+    fallback is only looked up for the lines without a code match.
+    """
+    code_col = q_cols.get("code")
+    has_fallback = bool(q_cols.get("processId") and q_cols.get("article") and q_cols.get("questionText"))
+    code_type = col_types.get(code_col, "LONGTEXT") if code_col else "LONGTEXT"
+    article_type = col_types.get(q_cols.get("article"), "LONGTEXT")
+    text_type = col_types.get(q_cols.get("questionText"), "LONGTEXT")
+    cur.execute(
+        "CREATE TEMPORARY TABLE patch_lines ("
+        "line INT NOT NULL PRIMARY KEY, "
+        f"code {code_type} NULL, processId BIGINT NULL, article {article_type} NULL, questionText {text_type} NULL)"
+    )
+    try:
+        insert_sql = "INSERT INTO patch_lines (line, code, processId, article, questionText) VALUES (%s, %s, %s, %s, %s)"
+        rows = [(line, *values) for line, values in enumerate(lines)]
+        for start in range(0, len(rows), BATCH_SIZE):
+            # mysql-connector rewrites executemany INSERTs into one multi-row INSERT
+            cur.executemany(insert_sql, rows[start:start + BATCH_SIZE])
+
+        ref_sql = f"q.`{q_cols['referentialId']}` = %s"
+        by_code: Dict[int, List[int]] = {}
+        if code_col:
+            # UPDATE by code patched every row with that code
+            cur.execute(
+                f"SELECT l.line, q.id FROM patch_lines l JOIN questions q ON q.`{code_col}` = l.code "
+                f"WHERE {ref_sql} ORDER BY q.id",
+                (referential_id,),
+            )
+            for line, qid in cur.fetchall():
+                by_code.setdefault(int(line), []).append(int(qid))
+
+        by_fallback: Dict[int, int] = {}
+        if has_fallback:
+            if by_code:
+                # lines matched by code never use the fallback: drop them before its join
+                cur.execute(
+                    f"DELETE l FROM patch_lines l JOIN questions q ON q.`{code_col}` = l.code WHERE {ref_sql}",
+                    (referential_id,),
+                )
+            # the fallback UPDATE had LIMIT 1: keep one row only
+            cur.execute(
+                f"SELECT l.line, MIN(q.id) FROM patch_lines l JOIN questions q "
+                f"ON q.`{q_cols['processId']}` = l.processId AND q.`{q_cols['article']}` = l.article "
+                f"AND q.`{q_cols['questionText']}` = l.questionText "
+                f"WHERE {ref_sql} GROUP BY l.line",
+                (referential_id,),
+            )
+            by_fallback = {int(line): int(qid) for line, qid in cur.fetchall()}
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS patch_lines")
+    return by_code, by_fallback
+
+
+def apply_patch(cur, patch_cols: List[str], values_by_id: Dict[int, tuple]) -> None:
+    """Stage (id, new values) in a temporary table, then patch every row with one UPDATE ... JOIN."""
+    cols_sql = ", ".join(f"`{c}`" for c in patch_cols)
+    col_defs = ", ".join(f"`{c}` LONGTEXT NULL" for c in patch_cols)
+    cur.execute(f"CREATE TEMPORARY TABLE patch_values (id BIGINT NOT NULL PRIMARY KEY, {col_defs})")
+    try:
+        placeholders = ", ".join(["%s"] * (len(patch_cols) + 1))
+        insert_sql = f"INSERT INTO patch_values (id, {cols_sql}) VALUES ({placeholders})"
+        rows = [(qid, *vals) for qid, vals in values_by_id.items()]
+        for start in range(0, len(rows), BATCH_SIZE):
+            # mysql-connector rewrites executemany INSERTs into one multi-row INSERT
+            cur.executemany(insert_sql, rows[start:start + BATCH_SIZE])
+
+        sets = ", ".join(f"q.`{c}` = p.`{c}`" for c in patch_cols)
+        cur.execute(f"UPDATE questions q JOIN patch_values p ON q.id = p.id SET {sets}")
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS patch_values")
+
+
+@lru_cache(maxsize=2048)  # ISO sheets repeat the same risk phrases
 def json_dump_or_none(risk: Optional[str]) -> Optional[str]:
     if not risk:
         return None
-    import json
     return json.dumps([risk], ensure_ascii=False)
 
 
@@ -155,7 +322,8 @@ def connect_with_retry(db_config: Dict[str, Any], retries: int = 6) -> mysql.con
     base_cfg.update(
         {
             "connection_timeout": 15,
-            "use_pure": True,
+            # C extension protocol layer (the connector falls back to pure Python if it is missing)
+            "use_pure": False,
             "ssl_disabled": False,
             "ssl_verify_cert": False,
             "ssl_verify_identity": False,
@@ -203,47 +371,22 @@ def main() -> None:
     print(f"Dry-run: {dry_run}")
     print(f"DB: {db_config['host']}:{db_config['port']} / {db_config['database']} (user={db_config['user']})")
 
-    sheet = build_sheet(excel_path)
+    used_headers = {
+        normalize_header(alias)
+        for alias in PROCESS_ALIASES + ARTICLE_ALIASES + QUESTION_ALIASES
+        + CODE_ALIASES + RISK_ALIASES + EXPECTED_ALIASES
+    }
+    sheet = build_sheet(excel_path, usecols=lambda name: normalize_header(str(name)) in used_headers)
 
     conn = connect_with_retry(db_config)
-    cur = conn.cursor(dictionary=True)
+    cur = conn.cursor()
 
     q_cols = detect_cols(cur, db_config["database"])
-    process_map = load_process_map(cur)
-
-    set_parts = []
-    if q_cols.get("risk"):
-        set_parts.append(f"`{q_cols['risk']}` = %s")
-    if q_cols.get("risks"):
-        set_parts.append(f"`{q_cols['risks']}` = %s")
-    if q_cols.get("expectedEvidence"):
-        set_parts.append(f"`{q_cols['expectedEvidence']}` = %s")
-
-    update_by_code_sql = None
-    if q_cols.get("code"):
-        update_by_code_sql = f"""
-          UPDATE questions
-          SET {", ".join(set_parts)}
-          WHERE `{q_cols['referentialId']}` = %s AND `{q_cols['code']}` = %s
-        """
 
-    select_fallback_sql = None
-    update_by_id_sql = None
-    if q_cols.get("processId") and q_cols.get("article") and q_cols.get("questionText"):
-        select_fallback_sql = f"""
-          SELECT id
-          FROM questions
-          WHERE `{q_cols['referentialId']}` = %s
-            AND `{q_cols['processId']}` = %s
-            AND `{q_cols['article']}` = %s
-            AND `{q_cols['questionText']}` = %s
-          LIMIT 1
-        """
-        update_by_id_sql = f"""
-          UPDATE questions
-          SET {", ".join(set_parts)}
-          WHERE id = %s
-        """
+    # patched columns, in the order of params_set below
+    patch_cols = [q_cols[k] for k in ("risk", "risks", "expectedEvidence") if q_cols.get(k)]
+
+    values_by_id: Dict[int, tuple] = {}
 
     updated = 0
     updated_by_code = 0
@@ -252,11 +395,34 @@ def main() -> None:
     missing_process = 0
     not_found = 0
 
-    for _, row in sheet.iterrows():
-        process_name = get_cell(row, ["Processus concerné", "Processus concerne"])
-        article = get_cell(row, ["Clause"]) or "N/A"
-        question_text = get_cell(row, ["Question d’audit détaillée", "Question d'audit détaillée"])
-        code = get_cell(row, ["code", "Code", "CODE"])
+    # resolve Excel columns once (positions in sheet.columns)
+    header_index = build_header_index(sheet.columns)
+    i_process = resolve_column(header_index, PROCESS_ALIASES)
+    i_article = resolve_column(header_index, ARTICLE_ALIASES)
+    i_question = resolve_column(header_index, QUESTION_ALIASES)
+    i_code = resolve_column(header_index, CODE_ALIASES)
+    i_risk = resolve_column(header_index, RISK_ALIASES)
+    i_expected = resolve_column(header_index, EXPECTED_ALIASES)
+
+    # clean each used column once, then walk the lines by zipping the columns
+    processes = get_column(sheet, i_process)
+    lines = zip(
+        processes,
+        get_column(sheet, i_article),
+        get_column(sheet, i_question),
+        get_column(sheet, i_code),
+        get_column(sheet, i_risk),
+        get_column(sheet, i_expected),
+    )
+
+    process_map = load_process_map(cur, needed_process_names(processes))
+
+    # lines to match: (code, processId, article, normalized questionText) and their new values
+    candidates: List[Tuple[Optional[str], int, str, str]] = []
+    candidate_values: List[tuple] = []
+
+    for process_name, article, question_text, code, risk, expected in lines:
+        article = article or "N/A"
 
         if not process_name or not question_text:
             skipped += 1
@@ -267,10 +433,6 @@ def main() -> None:
             missing_process += 1
             continue
 
-        # ✅ accept both headers
-        risk = get_cell(row, ["Risque", "Risques"])
-        expected = get_cell(row, ["Preuves attendues"])
-
         params_set: List[Any] = []
         if q_cols.get("risk"):
             params_set.append(risk)
@@ -283,29 +445,34 @@ def main() -> None:
             updated += 1
             continue
 
-        did_update = False
-        if update_by_code_sql and code:
-            cur.execute(update_by_code_sql, tuple(params_set + [referential_id, code]))
-            if cur.rowcount > 0:
-                updated += 1
-                updated_by_code += 1
-                did_update = True
-
-        if did_update:
+        candidates.append((code, pid, article, normalize_question_text(question_text)))
+        candidate_values.append(tuple(params_set))
+
+    by_code: Dict[int, List[int]] = {}
+    by_fallback: Dict[int, int] = {}
+    if candidates:
+        warn_missing_indexes(cur, q_cols)
+        col_types = match_column_types(cur, db_config["database"], q_cols)
+        by_code, by_fallback = match_lines(cur, q_cols, col_types, referential_id, candidates)
+
+    for line, values in enumerate(candidate_values):
+        ids = by_code.get(line, [])
+        if ids:
+            updated_by_code += 1
+        elif line in by_fallback:
+            ids = [by_fallback[line]]
+            updated_by_fallback += 1
+        else:
+            not_found += 1
             continue
 
-        if select_fallback_sql and update_by_id_sql:
-            qt = normalize_question_text(question_text)
-            cur.execute(select_fallback_sql, (referential_id, pid, article, qt))
-            r = cur.fetchone()
-            if r and r.get("id"):
-                cur.execute(update_by_id_sql, tuple(params_set + [int(r["id"])]))
-                if cur.rowcount > 0:
-                    updated += 1
-                    updated_by_fallback += 1
-                    continue
-
-        not_found += 1
+        updated += 1
+        for qid in ids:
+            # a later Excel line wins, as with the former row-by-row UPDATEs
+            values_by_id[qid] = values
+
+    if values_by_id:
+        apply_patch(cur, patch_cols, values_by_id)
 
     conn.commit()
 
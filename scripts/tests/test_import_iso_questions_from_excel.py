@@ -0,0 +1,51 @@
+import os
+import re
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import import_iso_questions_from_excel as importer  # noqa: E402
+
+
+COLUMNS = ["referentialId", "processId", "article", "questionText", "questionKey", "displayOrder"]
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+
+class StagingUpsertSqlTest(unittest.TestCase):
+    def test_update_list_is_qualified(self):
+        sql = importer.staging_upsert_sql(COLUMNS, "questionKey")
+        _, on_duplicate = sql.split("ON DUPLICATE KEY UPDATE ")
+        assignments = [a.strip() for a in on_duplicate.split(",")]
+
+        self.assertEqual(len(assignments), len(COLUMNS) - 1)
+        for column, assignment in zip([c for c in COLUMNS if c != "questionKey"], assignments):
+            self.assertEqual(assignment, f"questions.`{column}` = s.`{column}`")
+        self.assertNotIn("VALUES(", sql)
+
+    def test_select_reads_the_aliased_staging_table(self):
+        sql = importer.staging_upsert_sql(COLUMNS, "questionKey")
+        select = re.search(r"SELECT (.*) FROM questions_staging AS s ", sql)
+
+        self.assertIsNotNone(select)
+        self.assertEqual(select.group(1), ", ".join(f"s.`{c}`" for c in COLUMNS))
+
+    def test_upsert_via_staging_runs_the_qualified_statement(self):
+        cur = RecordingCursor()
+        with mock.patch.object(importer, "load_data_local_infile", return_value=True):
+            self.assertTrue(importer.upsert_via_staging(cur, COLUMNS, [], "questionKey"))
+
+        self.assertIn(importer.staging_upsert_sql(COLUMNS, "questionKey"), cur.statements)
+        self.assertEqual(cur.statements[-1], "DROP TEMPORARY TABLE IF EXISTS questions_staging")
+
+
+if __name__ == "__main__":
+    unittest.main()